@@ -0,0 +1,9 @@
+# Oracle NoSQL Database benchmark. Importing the package is cheap, the heavy
+# optional imports are deferred by the lazy module. Run it with python -m
+# oraclenosql_perf.cli (interactive) or python -m oraclenosql_perf.runner
+# (headless).
+#
+# config holds the settings and metrics the results; workload drives the
+# store, generation produces the rows, and reads, mixed, async_runner and
+# comparisons are the workloads built on top. reports turns the results into
+# plots and the Excel workbook.
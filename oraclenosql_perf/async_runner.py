@@ -0,0 +1,140 @@
+from borneo import DeleteRequest, PutRequest, QueryRequest
+from . import config, generation, metrics, rate_control, schema, workload
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+# asyncio runner that keeps a bounded number of requests in flight on a pool
+# of handles, swept over ASYNC_CONCURRENCY_DEPTHS.
+
+class AsyncHandle:
+    # Runs the blocking handle calls on a thread pool with one handle per
+    # thread, and lets at most depth of them be in flight at any time
+    def __init__(self, depth):
+        self.depth = depth
+        self.semaphore = asyncio.Semaphore(depth)
+        self.handles = []
+        self.handles_lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=depth, initializer=self.init_worker)
+
+    def init_worker(self):
+        handle = workload.get_handle()
+        workload.worker_state.handle = handle
+        with self.handles_lock:
+            self.handles.append(handle)
+
+    @staticmethod
+    def worker_call(operation, table, request):
+        handle = workload.worker_state.handle
+        return rate_control.timed_call(operation, table, getattr(handle, operation), request)
+
+    async def call(self, operation, table, request):
+        async with self.semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, self.worker_call, operation, table, request)
+
+    async def put(self, table, request):
+        return await self.call("put", table, request)
+
+    async def get(self, table, request):
+        return await self.call("get", table, request)
+
+    async def delete(self, table, request):
+        return await self.call("delete", table, request)
+
+    async def query(self, table, request):
+        return await self.call("query", table, request)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        for handle in self.handles:
+            handle.close()
+        self.handles.clear()
+
+async def run_bounded(async_handle, calls):
+    # Keeps the number of outstanding tasks bounded so that the calls are
+    # consumed lazily instead of all being scheduled up front
+    pending = set()
+    async for operation, table, request in calls:
+        if len(pending) >= 2 * async_handle.depth:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+        pending.add(asyncio.ensure_future(async_handle.call(operation, table, request)))
+    if pending:
+        done, _ = await asyncio.wait(pending)
+        for task in done:
+            task.result()
+
+async def async_scan_table(async_handle, table):
+    request = QueryRequest().set_statement(f'SELECT * FROM {schema.get_table_name(table)}')
+    if config.QUERY_LIMIT:
+        request.set_limit(config.QUERY_LIMIT)
+    if config.QUERY_MAX_READ_KB:
+        request.set_max_read_kb(config.QUERY_MAX_READ_KB)
+    while True:
+        query_result = await async_handle.query(table, request)
+        for result in query_result.get_results():
+            yield result
+        if request.is_done():
+            break
+
+async def async_insert_calls(dataset):
+    for table, row in schema.schema_rows(generation.dataset_rows(dataset)):
+        yield "put", table, PutRequest().set_table_name(schema.get_table_name(table)).set_value(row)
+
+async def async_update_calls(async_handle):
+    for table in config.TABLES:
+        async for result in async_scan_table(async_handle, table):
+            record = schema.mark_updated(table, result)
+            yield "put", table, PutRequest().set_table_name(schema.get_table_name(table)).set_value(record)
+
+async def async_delete_calls(async_handle):
+    for table in config.TABLES:
+        async for result in async_scan_table(async_handle, table):
+            yield "delete", table, DeleteRequest().set_table_name(schema.get_table_name(table)).set_key(schema.get_primary_key(table, dict(result)))
+
+async def async_retrieve_all_data(async_handle):
+    async def count_rows(table):
+        rows = 0
+        async for _ in async_scan_table(async_handle, table):
+            rows += 1
+        return rows
+    # Tables are scanned concurrently, the batches of one table in order
+    counts = await asyncio.gather(*(count_rows(table) for table in config.TABLES))
+    print(f"All data retrieved successfully ({sum(counts)} rows)")
+
+async def measure_time_async(operation_name, depth, func):
+    with metrics.measured_phase(operation_name):
+        await func()
+    duration = metrics.timings[-1][1]
+    merged = metrics.merge_latencies(operation_name)
+    ops_per_sec = merged.count / duration if duration > 0 else 0.0
+    metrics.async_stats.append((depth, operation_name, merged.count, duration, ops_per_sec, merged.percentile(50) / 1e6, merged.percentile(99) / 1e6))
+
+async def run_async_phases(depth, dataset):
+    async_handle = AsyncHandle(depth)
+    try:
+        phases = [
+            ("Insert All Data", lambda: run_bounded(async_handle, async_insert_calls(dataset))),
+            ("Retrieve All Data", lambda: async_retrieve_all_data(async_handle)),
+            ("Update All Data", lambda: run_bounded(async_handle, async_update_calls(async_handle))),
+            ("Delete All Data", lambda: run_bounded(async_handle, async_delete_calls(async_handle)))
+        ]
+        for phase, func in phases:
+            await measure_time_async(f"{phase} (async depth {depth})", depth, func)
+    finally:
+        async_handle.close()
+
+def run_async_sweep(handle, dataset):
+    if dataset is None:
+        dataset = generation.generate_dataset()
+    for depth in config.ASYNC_CONCURRENCY_DEPTHS:
+        workload.drop_tables(handle)
+        workload.create_tables(handle)
+        asyncio.run(run_async_phases(depth, dataset))
+
+    print("Async throughput and latency by concurrency depth:")
+    print(f"  {'depth':>6} {'phase':<45} {'ops':>8} {'ops/sec':>10} {'p50 ms':>9} {'p99 ms':>9}")
+    for depth, phase, ops, _, ops_per_sec, p50, p99 in metrics.async_stats:
+        print(f"  {depth:>6} {phase:<45} {ops:>8} {ops_per_sec:>10.1f} {p50:>9.3f} {p99:>9.3f}")
@@ -0,0 +1,214 @@
+from . import config, generation, lazy, metrics, reports, results_store, workload
+from .phases import run_benchmark
+import argparse
+from importlib.metadata import PackageNotFoundError, version
+import os
+import platform
+import sys
+
+# Command line of the full benchmark: a single run, a scaling sweep or the
+# comparison of a stored run against a baseline. The settings are in the
+# config module.
+
+# Exit codes of a gated run: a regression against the baseline, and a
+# baseline that is missing or has no run to compare with
+EXIT_REGRESSION = 1
+EXIT_NO_BASELINE = 3
+
+def get_driver_version():
+    try:
+        return version("borneo")
+    except PackageNotFoundError:
+        return None
+
+def run_metadata(multiplication, labels):
+    return {
+        "labels": labels,
+        "environment": {"host": platform.node(), "platform": platform.platform(), "python": platform.python_version(),
+                        "borneo": get_driver_version(), "cpus": os.cpu_count(), "endpoint": config.kvstore_endpoint},
+        "scale": {"multiplication": multiplication, "users": config.NUM_USERS, "courses": config.NUM_COURSES, "lessons_per_course": config.NUM_LESSONS_PER_COURSE,
+                  "quizzes_per_lesson": config.NUM_QUIZZES_PER_LESSON, "questions_per_quiz": config.NUM_QUESTIONS_PER_QUIZ, "enrollments_per_user": config.NUM_ENROLLMENTS_PER_USER},
+        "strategy": {"schema_mode": config.SCHEMA_MODE, "write_mode": config.WRITE_MODE, "workers": config.NUM_WORKERS, "processes": config.NUM_PROCESSES, "batch_size": config.BATCH_SIZE,
+                     "update_strategy": config.UPDATE_STRATEGY, "delete_strategy": config.DELETE_STRATEGY, "data_generator": config.DATA_GENERATOR,
+                     "query_limit": config.QUERY_LIMIT, "query_max_read_kb": config.QUERY_MAX_READ_KB},
+        "backend": {"backend": config.BACKEND, "mock_latency_ms": config.MOCK_LATENCY_MS, "mock_jitter_ms": config.MOCK_JITTER_MS, "mock_throttle_rate": config.MOCK_THROTTLE_RATE} if config.BACKEND == "mock" else {"backend": config.BACKEND}
+    }
+
+def store_results(args, multiplication):
+    latencies = []
+    with metrics.histograms_lock:
+        for (phase, operation, table), histogram in metrics.histograms.items():
+            percentiles = {format(percentile, 'g'): histogram.percentile(percentile) / 1e6 for percentile in config.REPORT_PERCENTILES}
+            latencies.append((phase, operation, table, histogram.count, histogram.ops_per_sec(), percentiles, histogram.max / 1e6))
+    run_id = results_store.save_run(args.results_db, run_metadata(multiplication, dict(args.label)), metrics.timings, latencies)
+    print(f"Run {run_id} saved to {args.results_db}")
+    return run_id
+
+def gate_run(args, run_id):
+    # Saves the run into the named baseline and compares it, returns the exit
+    # code of the comparison
+    if args.save_baseline:
+        results_store.add_to_baseline(args.results_db, args.save_baseline, run_id)
+        print(f"Run {run_id} added to baseline {args.save_baseline}")
+    if not args.compare_to:
+        return 0
+    try:
+        regressions = results_store.compare_run(args.results_db, run_id, args.compare_to, config.REGRESSION_THRESHOLD, config.REGRESSION_SIGMAS, config.REGRESSION_MIN_COUNT)
+    except ValueError as e:
+        print(f"Cannot compare run {run_id}: {e}")
+        return EXIT_NO_BASELINE
+    for phase, operation, table, metric, baseline_value, value in regressions:
+        print(f"Regression: {phase} {operation} {table or '-'} {metric} {value:.3f} (baseline {baseline_value:.3f})")
+    if not regressions:
+        print(f"No regressions against baseline {args.compare_to}")
+        return 0
+    return EXIT_REGRESSION
+
+def record_sweep_point(multiplication, rows):
+    for phase, duration in metrics.timings:
+        merged = metrics.merge_latencies(phase)
+        rows_per_sec = rows / duration if duration > 0 else 0.0
+        metrics.sweep_stats.append([multiplication, config.NUM_USERS, config.NUM_COURSES, config.NUM_LESSONS_PER_COURSE, config.NUM_QUIZZES_PER_LESSON,
+                                     config.NUM_QUESTIONS_PER_QUIZ, rows, phase, duration, rows_per_sec, merged.count, merged.ops_per_sec(), merged.percentile(50) / 1e6, merged.percentile(99) / 1e6])
+
+def run_scaling_sweep(handle, args):
+    # Returns the worst exit code of the points
+    exit_code = 0
+    for multiplication in args.sweep:
+        print(f"Scaling sweep point: multiplication {multiplication}")
+        workload.reset_results()
+        config.edit_number_of_operations(multiplication, args.scale_children)
+        if config.BENCHMARK_GENERATORS:
+            generation.benchmark_generators()
+        # Every point is generated before its phases are timed and runs on
+        # freshly created tables
+        dataset = generation.load_dataset() if config.USE_DATASET else generation.generate_dataset()
+        run_benchmark(handle, dataset)
+        record_sweep_point(multiplication, len(dataset))
+        reports.save_timings_to_excel("timings_OracleNoSQL_{}.xlsx".format(multiplication))
+        exit_code = max(gate_run(args, store_results(args, multiplication)), exit_code)
+    report_scaling_sweep()
+    return exit_code
+
+def report_scaling_sweep():
+    # Efficiency is the rows/sec of a point relative to the smallest point of
+    # the same phase; a drop well below 1 marks non-linear degradation
+    first_rows_per_sec = {}
+    for point in metrics.sweep_stats:
+        baseline = first_rows_per_sec.setdefault(point[7], point[9])
+        point.append(point[9] / baseline if baseline > 0 else 0.0)
+    print("Scaling sweep:")
+    print(f"  {'phase':<40} {'x':>5} {'rows':>10} {'seconds':>9} {'rows/sec':>10} {'efficiency':>10} {'p50 ms':>9} {'p99 ms':>9}")
+    for point in sorted(metrics.sweep_stats, key=lambda point: (point[7], point[0])):
+        print(f"  {point[7]:<40} {point[0]:>5} {point[6]:>10} {point[8]:>9.2f} {point[9]:>10.1f} {point[14]:>10.2f} {point[12]:>9.3f} {point[13]:>9.3f}")
+
+    sweep_df = lazy.pd.DataFrame(metrics.sweep_stats, columns=["Multiplication", "Users", "Courses", "Lessons per Course", "Quizzes per Lesson", "Questions per Quiz",
+                                                                    "Rows", "Phase", "Duration (seconds)", "Rows/sec", "Requests", "Ops/sec", "p50 (ms)", "p99 (ms)", "Efficiency"])
+    sweep_df.to_excel(config.SWEEP_RESULTS_FILE, sheet_name="Scaling", index=False)
+    print(f"Scaling sweep saved to {config.SWEEP_RESULTS_FILE} successfully")
+
+    phases = {}
+    for point in metrics.sweep_stats:
+        phases.setdefault(point[7], []).append((point[6], point[9], point[13]))
+    fig, (throughput_ax, latency_ax) = lazy.plt.subplots(2, 1, figsize=(12, 10))
+    for phase, points in phases.items():
+        points.sort()
+        throughput_ax.plot([rows for rows, _, _ in points], [rows_per_sec for _, rows_per_sec, _ in points], marker='o', label=phase)
+        latency_ax.plot([rows for rows, _, _ in points], [p99 for _, _, p99 in points], marker='o', label=phase)
+    for ax, label in [(throughput_ax, 'Rows/sec'), (latency_ax, 'p99 latency (ms)')]:
+        ax.set_xscale('log')
+        ax.set_yscale('log')
+        ax.set_xlabel('Dataset size (rows)')
+        ax.set_ylabel(label)
+        ax.grid(True)
+        ax.legend(fontsize='small')
+    throughput_ax.set_title('Throughput versus dataset size')
+    latency_ax.set_title('p99 latency versus dataset size')
+    fig.tight_layout()
+    fig.savefig(config.SWEEP_PLOT_FILE)
+    lazy.plt.close(fig)
+    print(f"Scaling sweep plot saved to {config.SWEEP_PLOT_FILE} successfully")
+
+def parse_label(value):
+    name, separator, label = value.partition("=")
+    if not separator:
+        raise argparse.ArgumentTypeError(f"Label {value} is not NAME=VALUE")
+    return name, label
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Oracle NoSQL Database performance test")
+    parser.add_argument("--multiplication", type=int, help="multiply the amount of data by this factor instead of asking for it")
+    parser.add_argument("--sweep", type=lambda value: [int(factor) for factor in value.split(",")],
+                        help="comma-separated multiplication factors to run one after another, e.g. 1,2,4,8")
+    parser.add_argument("--scale-children", action="store_true",
+                        help="also multiply the lessons per course, quizzes per lesson and questions per quiz")
+    parser.add_argument("--results-db", default=config.RESULTS_DB, help="SQLite results store every run is appended to")
+    parser.add_argument("--label", type=parse_label, action="append", default=[],
+                        help="NAME=VALUE stored with the run, e.g. proxy=24.1 or cluster=3x3")
+    parser.add_argument("--save-baseline", metavar="NAME", help="add the run to the named baseline")
+    parser.add_argument("--compare-to", metavar="NAME", help="compare the run to the named baseline, exit with 1 on a regression and 3 when the baseline has no comparable run")
+    parser.add_argument("--run", type=int, metavar="ID", help="use this stored run for --save-baseline and --compare-to instead of running the benchmark")
+    parser.add_argument("--no-plot", action="store_true", help="do not show the latency plot at the end")
+    parser.add_argument("--profile", action="store_true", help="save a cProfile profile of every phase to PROFILE_DIR")
+    parser.add_argument("--trace-allocations", action="store_true", help="record peak memory and top allocators of every phase")
+    parser.add_argument("--split-request-time", action="store_true", help="split request time into client CPU and waiting")
+    parser.add_argument("--rate-control", action="store_true", help="pace throttled tables with AIMD rate control instead of the driver's retry handler")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    config.PROFILE_PHASES = config.PROFILE_PHASES or args.profile
+    config.TRACE_ALLOCATIONS = config.TRACE_ALLOCATIONS or args.trace_allocations
+    config.SPLIT_REQUEST_TIME = config.SPLIT_REQUEST_TIME or args.split_request_time
+    config.RATE_CONTROL = config.RATE_CONTROL or args.rate_control
+    if args.run is not None:
+        return gate_run(args, args.run)
+    handle = None
+    try:
+        # Create a handle
+        handle = workload.get_handle()
+
+        if args.sweep:
+            exit_code = run_scaling_sweep(handle, args)
+            print('Performance test completed')
+            return exit_code
+
+        multiplication = args.multiplication
+        if multiplication is None:
+            multiplication = input("Enter how many times to multiply the amount of data: ")
+            try:
+                multiplication = int(multiplication)
+            except:
+                print("Intiger not provided")
+            if not isinstance(multiplication, int):
+                print("Provided multiplication factor is not an integer. Defaulting to 1.")
+                multiplication = 1
+        config.edit_number_of_operations(multiplication, args.scale_children)
+
+        if config.BENCHMARK_GENERATORS:
+            generation.benchmark_generators()
+
+        # Generate or load the dataset before any phase is timed
+        dataset = generation.load_dataset() if config.USE_DATASET else None
+
+        run_benchmark(handle, dataset)
+
+        print('Performance test completed')
+
+        reports.save_timings_to_excel("timings_OracleNoSQL_{}.xlsx".format(multiplication))
+        exit_code = gate_run(args, store_results(args, multiplication))
+        if not args.no_plot:
+            reports.plot_timings()
+        return exit_code
+
+    except Exception as e:
+        print(e)
+        return 1
+    finally:
+        # If the handle isn't closed Python will not exit properly
+        workload.close_write_executor()
+        if handle is not None:
+            handle.close()
+
+if __name__ == '__main__':
+    sys.exit(main())
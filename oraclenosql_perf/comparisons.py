@@ -0,0 +1,178 @@
+from . import config, generation, lazy, metrics, reads, workload
+import json
+import os
+import random
+import tempfile
+
+# Side by side comparisons on the same data: update and delete strategies,
+# write modes, schema layouts and payload sizes.
+
+# Latencies of whole course trees, left out of the store request latencies
+TREE_OPERATIONS = ("load_course_tree", "load_course")
+
+def reload_data(handle, dataset):
+    workload.drop_tables(handle)
+    workload.create_tables(handle)
+    workload.put_dataset(handle, dataset)
+
+def compare_update_delete_strategies(handle, dataset):
+    if dataset is None:
+        dataset = generation.generate_dataset()
+    results = []
+    for kind, strategies, functions in [("Update", config.COMPARE_UPDATE_STRATEGIES, workload.UPDATE_FUNCTIONS), ("Delete", config.COMPARE_DELETE_STRATEGIES, workload.DELETE_FUNCTIONS)]:
+        for strategy in strategies:
+            reload_data(handle, dataset)
+            metrics.measure_time(f"{kind} All Data ({strategy})", lambda: functions[strategy](handle))
+            results.append((kind, strategy, metrics.timings[-1][1]))
+
+    print("Update and delete strategies:")
+    baselines = {}
+    for kind, strategy, duration in results:
+        baseline = baselines.setdefault(kind, (strategy, duration))
+        speedup = baseline[1] / duration if duration > 0 else 0.0
+        print(f"  {kind} {strategy}: {duration:.2f} seconds ({speedup:.2f}x {baseline[0]})")
+
+def compare_write_modes(handle, dataset=None):
+    # Every mode writes the very same rows into freshly created tables
+    if dataset is None:
+        dataset = generation.generate_dataset()
+    aggregate = {}
+    for write_mode in config.COMPARE_WRITE_MODES:
+        with config.override(SCHEMA_MODE="sharded", WRITE_MODE=write_mode):
+            workload.drop_tables(handle)
+            workload.create_tables(handle)
+            workload.reset_write_stats()
+            phase = f"Compare Write Modes ({write_mode})"
+            with metrics.measuring(phase):
+                workload.put_dataset(handle, dataset)
+            workload.report_write_throughput("Compare Write Modes")
+            metrics.report_latencies(phase)
+            aggregate[write_mode] = metrics.throughputs[-1][-1]
+    baseline = aggregate[config.COMPARE_WRITE_MODES[0]]
+    for write_mode, rows_per_sec in aggregate.items():
+        speedup = rows_per_sec / baseline if baseline > 0 else 0.0
+        print(f"{write_mode}: {rows_per_sec:.1f} rows/sec ({speedup:.2f}x {config.COMPARE_WRITE_MODES[0]})")
+
+def compare_schema_layouts(handle, dataset=None):
+    if dataset is None:
+        dataset = generation.generate_dataset()
+    # Every layout loads the same course trees and reads the same sample
+    course_ids = [row["id"] for table, row in dataset.rows("courses") if table == "Courses"]
+    if not course_ids:
+        print("Schema layout comparison skipped, no courses generated")
+        return
+    read_ids = [random.choice(course_ids) for _ in range(config.COURSE_TREE_READS)]
+    for layout in config.COMPARE_SCHEMA_LAYOUTS:
+        with config.override(SCHEMA_MODE=layout):
+            workload.drop_tables(handle)
+            workload.create_tables(handle)
+            workload.reset_write_stats()
+            metrics.measure_time(f"Load Course Trees ({layout})", lambda: workload.put_rows(handle, dataset.rows("courses")))
+            load_duration = metrics.timings[-1][1]
+            workload.report_write_throughput(f"Load Course Trees ({layout})")
+            load_rows_per_sec = metrics.throughputs[-1][-1]
+            metrics.measure_time(f"Read Course Trees ({layout})", lambda: reads.read_course_trees(handle, read_ids))
+            read_duration = metrics.timings[-1][1]
+            trees_per_sec = len(read_ids) / read_duration if read_duration > 0 else 0.0
+            metrics.layout_stats.append((layout, config.WRITE_MODE, load_duration, load_rows_per_sec, len(read_ids), read_duration, trees_per_sec))
+
+    print("Course tree load and read by schema layout:")
+    baseline = metrics.layout_stats[-len(config.COMPARE_SCHEMA_LAYOUTS)]
+    for layout, _, load_duration, load_rows_per_sec, _, read_duration, trees_per_sec in metrics.layout_stats[-len(config.COMPARE_SCHEMA_LAYOUTS):]:
+        load_speedup = baseline[2] / load_duration if load_duration > 0 else 0.0
+        read_speedup = baseline[5] / read_duration if read_duration > 0 else 0.0
+        print(f"  {layout}: load {load_duration:.2f} seconds ({load_rows_per_sec:.1f} rows/sec, {load_speedup:.2f}x {baseline[0]}), read {read_duration:.2f} seconds ({trees_per_sec:.1f} trees/sec, {read_speedup:.2f}x {baseline[0]})")
+
+def pad_payload(text, size):
+    # Repeats the generated text up to size bytes, so the payload stays text
+    # the store cannot compress better than real content
+    text = text + " "
+    return (text * (size // len(text) + 1))[:size]
+
+def payload_rows(rows, size, counter):
+    # Pads the large fields of the course trees and counts the bytes of the
+    # rows as JSON, which is roughly what the driver serializes
+    for table, row in rows:
+        if table == "Courses":
+            row = dict(row, description=pad_payload(row["description"], size))
+        elif table == "Lessons":
+            row = dict(row, content=pad_payload(row["content"], size))
+        counter[0] += 1
+        counter[1] += len(json.dumps(row, default=str))
+        yield table, row
+
+def payload_dataset(dataset, size):
+    # The course trees padded to one size, written to a temporary dataset
+    # before any load is timed so the timed phases only replay them like the
+    # insert phases do. Returns it with the rows and bytes it holds
+    counter = [0, 0]
+    fd, path = tempfile.mkstemp(prefix="payload_")
+    os.close(fd)
+    generation.write_dataset(path, [], payload_rows(dataset.rows("courses"), size, counter), [])
+    return generation.Dataset(path, temporary=True), counter[0], counter[1]
+
+def payload_sweep(handle, dataset=None):
+    if dataset is None:
+        dataset = generation.generate_dataset()
+    course_ids = [row["id"] for table, row in dataset.rows("courses") if table == "Courses"]
+    if not course_ids:
+        print("Payload sweep skipped, no courses generated")
+        return
+    read_ids = [random.choice(course_ids) for _ in range(config.PAYLOAD_READS)]
+    for size in config.PAYLOAD_SIZES:
+        # The same padded rows are loaded in every layout
+        padded, rows, written_bytes = payload_dataset(dataset, size)
+        for layout in config.PAYLOAD_LAYOUTS:
+            with config.override(SCHEMA_MODE=layout):
+                workload.drop_tables(handle)
+                workload.create_tables(handle)
+                load_phase = f"Load Course Trees ({layout}, {size} B)"
+                metrics.measure_time(load_phase, lambda: workload.put_rows(handle, padded.rows("courses")))
+                load_duration = metrics.timings[-1][1]
+                read_phase = f"Read Course Trees ({layout}, {size} B)"
+                metrics.measure_time(read_phase, lambda: reads.read_course_trees(handle, read_ids))
+                read_duration = metrics.timings[-1][1]
+                # Every tree has the same shape, so the bytes read follow from
+                # the average tree written
+                read_bytes = written_bytes / len(course_ids) * len(read_ids)
+                load_requests = metrics.merge_latencies(load_phase, exclude=TREE_OPERATIONS)
+                read_requests = metrics.merge_latencies(read_phase, exclude=TREE_OPERATIONS)
+                metrics.payload_stats.append((size, layout, config.WRITE_MODE, rows, written_bytes / 2 ** 20, load_duration,
+                                              load_requests.count / load_duration if load_duration > 0 else 0.0,
+                                              written_bytes / 2 ** 20 / load_duration if load_duration > 0 else 0.0, load_requests.percentile(99) / 1e6,
+                                              len(read_ids), read_duration, read_requests.count / read_duration if read_duration > 0 else 0.0,
+                                              read_bytes / 2 ** 20 / read_duration if read_duration > 0 else 0.0, read_requests.percentile(99) / 1e6))
+    report_payload_sweep()
+
+def report_payload_sweep():
+    print("Payload sweep:")
+    print(f"  {'size B':>8} {'layout':<10} {'load ops/s':>10} {'load MB/s':>9} {'load p99':>9} {'read ops/s':>10} {'read MB/s':>9} {'read p99':>9}")
+    for size, layout, _, _, _, _, load_ops, load_mb, load_p99, _, _, read_ops, read_mb, read_p99 in metrics.payload_stats:
+        print(f"  {size:>8} {layout:<10} {load_ops:>10.1f} {load_mb:>9.2f} {load_p99:>9.3f} {read_ops:>10.1f} {read_mb:>9.2f} {read_p99:>9.3f}")
+
+    payload_df = lazy.pd.DataFrame(metrics.payload_stats, columns=["Payload (bytes)", "Layout", "Write Mode", "Rows", "MB Written", "Load (seconds)", "Load Ops/sec",
+                                                                   "Load MB/sec", "Load p99 (ms)", "Trees Read", "Read (seconds)", "Read Ops/sec", "Read MB/sec", "Read p99 (ms)"])
+    payload_df.to_excel(config.PAYLOAD_RESULTS_FILE, sheet_name="Payload", index=False)
+    print(f"Payload sweep saved to {config.PAYLOAD_RESULTS_FILE} successfully")
+
+    layouts = {}
+    for point in metrics.payload_stats:
+        layouts.setdefault(point[1], []).append(point)
+    fig, axes = lazy.plt.subplots(2, 2, figsize=(14, 10))
+    for layout, points in layouts.items():
+        points.sort()
+        sizes = [point[0] for point in points]
+        for ax, index, direction in [(axes[0][0], 7, "load"), (axes[0][1], 12, "read"), (axes[1][0], 6, "load"), (axes[1][1], 11, "read")]:
+            ax.plot(sizes, [point[index] for point in points], marker='o', label=f"{layout} {direction}")
+    for ax, label in [(axes[0][0], 'Load MB/sec'), (axes[0][1], 'Read MB/sec'), (axes[1][0], 'Load ops/sec'), (axes[1][1], 'Read ops/sec')]:
+        ax.set_xscale('log')
+        ax.set_yscale('log')
+        ax.set_xlabel('Payload size (bytes)')
+        ax.set_ylabel(label)
+        ax.set_title(f'{label} versus payload size')
+        ax.grid(True)
+        ax.legend(fontsize='small')
+    fig.tight_layout()
+    fig.savefig(config.PAYLOAD_PLOT_FILE)
+    lazy.plt.close(fig)
+    print(f"Payload sweep plot saved to {config.PAYLOAD_PLOT_FILE} successfully")
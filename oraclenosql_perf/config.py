@@ -0,0 +1,331 @@
+from contextlib import contextmanager
+import os
+
+# Settings of the benchmark. Every other module reads them as config.NAME at
+# call time, so the command line, main.py and the comparisons can change them
+# before or during a run.
+
+# Constants for the amounts of data to generate
+NUM_USERS = 10
+NUM_COURSES = 20
+NUM_LESSONS_PER_COURSE = 5
+NUM_QUIZZES_PER_LESSON = 2
+NUM_QUESTIONS_PER_QUIZ = 3
+NUM_ENROLLMENTS_PER_USER = 2
+
+# Amounts at multiplication factor 1
+BASE_COUNTS = {"NUM_USERS": NUM_USERS, "NUM_COURSES": NUM_COURSES, "NUM_LESSONS_PER_COURSE": NUM_LESSONS_PER_COURSE,
+               "NUM_QUIZZES_PER_LESSON": NUM_QUIZZES_PER_LESSON, "NUM_QUESTIONS_PER_QUIZ": NUM_QUESTIONS_PER_QUIZ,
+               "NUM_ENROLLMENTS_PER_USER": NUM_ENROLLMENTS_PER_USER}
+
+# Files the scaling sweep writes its summary to
+SWEEP_RESULTS_FILE = "scaling_sweep_OracleNoSQL.xlsx"
+SWEEP_PLOT_FILE = "scaling_sweep_OracleNoSQL.png"
+
+# Every run is appended to this SQLite results store
+RESULTS_DB = "results_OracleNoSQL.sqlite"
+# A run regresses when an operation's ops/sec drops or its p99 grows by more
+# than the larger of REGRESSION_THRESHOLD (relative) and REGRESSION_SIGMAS
+# standard deviations of the baseline runs; operations with fewer than
+# REGRESSION_MIN_COUNT requests are too noisy to compare
+REGRESSION_THRESHOLD = 0.10
+REGRESSION_SIGMAS = 3.0
+REGRESSION_MIN_COUNT = 100
+
+# Profiling of the measured phases, all off by default since they slow the
+# harness down: PROFILE_PHASES runs cProfile on the thread running the phase
+# (worker threads are not covered), TRACE_ALLOCATIONS records the peak traced
+# memory and the top allocating lines, and SPLIT_REQUEST_TIME splits every
+# request into client CPU time and time spent waiting inside the handle call
+PROFILE_PHASES = False
+TRACE_ALLOCATIONS = False
+SPLIT_REQUEST_TIME = False
+PROFILE_DIR = "profiles"
+PROFILE_TOP_FUNCTIONS = 30
+PROFILE_TOP_ALLOCATORS = 10
+
+# Data generator: "faker" calls Faker for every field of every row, "bulk"
+# builds whole columns at once from vocabularies pre-built with Faker
+DATA_GENERATOR = "faker"
+# Number of entries in each bulk generator vocabulary
+VOCABULARY_SIZE = 2000
+VOCABULARY_SEED = 0
+# Number of courses whose hierarchy the bulk generator builds per chunk
+BULK_CHUNK_COURSES = 1000
+# Number of users the bulk generator enrolls per chunk
+BULK_CHUNK_USERS = 10000
+# Compare rows/sec of both generators before the main phases
+BENCHMARK_GENERATORS = False
+
+# Pre-generated dataset: when enabled the insert phases replay rows generated
+# once per seed and scale and cached under DATASET_DIR
+USE_DATASET = True
+DATASET_SEED = 42
+DATASET_DIR = "datasets"
+# Rows per chunk of the dataset file, a phase holds one chunk at a time
+DATASET_CHUNK_ROWS = 10000
+
+# Oracle NoSQL Database endpoint
+kvstore_endpoint = 'localhost:8080'
+
+# Backend: "proxy" connects to kvstore_endpoint, "mock" keeps the tables in
+# memory in this process; the NOSQL_BACKEND environment variable overrides it
+BACKEND = os.environ.get("NOSQL_BACKEND", "proxy")
+# Latency added to every mock request, uniformly varied by the jitter, and the
+# fraction of mock requests failing with a throttling exception
+MOCK_LATENCY_MS = float(os.environ.get("MOCK_LATENCY_MS", 0.0))
+MOCK_JITTER_MS = float(os.environ.get("MOCK_JITTER_MS", 0.0))
+MOCK_THROTTLE_RATE = float(os.environ.get("MOCK_THROTTLE_RATE", 0.0))
+
+# Schema mode: "flat" keys every table by id alone, "sharded" adds the parent
+# id as shard key so that sibling rows can be written in one batch, and
+# "hierarchy" stores lessons, quizzes and questions in child tables of Courses
+# so that a course's whole subtree lives on one shard, and "json" is "flat"
+# with the fields of lessons and quizzes in one JSON document column
+SCHEMA_MODE = "flat"
+
+# Write mode: "single" issues every put from the main handle, "concurrent"
+# fans the puts out to a pool of workers, each with its own handle, and
+# "batched" groups rows sharing a shard key into WriteMultipleRequests
+WRITE_MODE = "single"
+NUM_WORKERS = 8
+# Maximum number of puts queued per worker before the generator waits
+MAX_PENDING_PER_WORKER = 4
+# Maximum number of operations per WriteMultipleRequest (at most 50)
+BATCH_SIZE = 50
+# Number of worker processes; above 1 the dataset is split into one
+# partition per process and each process runs the insert, update and delete
+# phases on its own partition with its own handle
+NUM_PROCESSES = 1
+
+# In-flight request limits for the asyncio runner, e.g. [1, 4, 16, 64]; each
+# depth runs the insert, retrieve, update and delete phases on fresh tables
+ASYNC_CONCURRENCY_DEPTHS = []
+
+# Read workload: random primary key gets of courses and users followed by
+# secondary index lookups of their lessons, quizzes and enrollments
+RUN_READ_WORKLOAD = False
+READ_WORKLOAD_OPERATIONS = 1000
+READ_CONSISTENCIES = ["EVENTUAL", "ABSOLUTE"]
+# Rows per child table written before and after the indexes are created to
+# measure the cost the indexes add to every write
+INDEX_SAMPLE_ROWS = 100
+
+# Cache benchmark: replays the same skewed course and user lookups without and
+# with a read-through cache in front of the gets and child lookups
+RUN_CACHE_BENCHMARK = False
+CACHE_MAX_ENTRIES = 1000
+CACHE_TTL_SECONDS = 60.0
+CACHE_READ_OPERATIONS = 5000
+# Zipf exponent of the key popularity, higher values make hot keys hotter
+CACHE_ZIPF_EXPONENT = 1.1
+# Fraction of the operations that rewrite a user instead of reading, which
+# invalidates the cached entries of that user
+CACHE_WRITE_FRACTION = 0.05
+
+# Mixed workload: requests drawn from MIXED_WORKLOAD_MIX arrive at
+# MIXED_TARGET_OPS_PER_SEC whether or not earlier ones have completed, and
+# their latency is measured from the intended arrival time
+RUN_MIXED_WORKLOAD = False
+MIXED_WORKLOAD_MIX = {"read": 0.80, "update": 0.15, "insert": 0.05}
+# Relative share of every table in the requests
+MIXED_TABLE_WEIGHTS = {"Users": 1, "Courses": 1, "Lessons": 1, "Quizzes": 1, "Questions": 1, "Enrollments": 1}
+# Key distribution: "uniform", "zipfian" (fixed hot keys) or "latest" (the
+# most recently inserted keys are the hottest)
+MIXED_KEY_DISTRIBUTION = "zipfian"
+MIXED_ZIPF_EXPONENT = 0.99
+# Arrival process: "constant" spacing or "poisson" with exponential gaps
+MIXED_ARRIVAL = "poisson"
+MIXED_TARGET_OPS_PER_SEC = 200
+MIXED_WARMUP_SECONDS = 5
+MIXED_DURATION_SECONDS = 30
+
+# Retries: throttling and other retryable errors are retried with exponential
+# backoff and full jitter instead of aborting the run
+MAX_RETRIES = 10
+RETRY_BASE_DELAY_MS = 10
+RETRY_MAX_DELAY_MS = 2000
+
+# Rate control, off by default: once a table is throttled its requests are
+# paced, the rate grows by RATE_CONTROL_INCREASE_OPS ops/sec every second
+# without throttling and is cut by RATE_CONTROL_DECREASE_FACTOR on
+# throttling. When it is on the retry handler of the driver is switched off so
+# throttling errors reach the controller
+RATE_CONTROL = False
+RATE_CONTROL_INCREASE_OPS = 10.0
+RATE_CONTROL_DECREASE_FACTOR = 0.7
+RATE_CONTROL_MIN_OPS = 1.0
+# Throttling errors of requests already in flight when the rate was cut do not
+# cut it again
+RATE_CONTROL_DECREASE_INTERVAL_MS = 100
+
+# (read units, write units, storage GB) applied to the top-level tables after
+# they are created, None keeps the limits the store assigns
+TABLE_LIMITS = None
+
+# Max throughput search: open-loop windows of the mixed workload whose offered
+# load grows by AIMD_INCREASE_OPS_PER_SEC while the p99 latency from the
+# intended arrival stays within SLO_P99_MS and is multiplied by
+# AIMD_DECREASE_FACTOR when it does not
+FIND_MAX_THROUGHPUT = False
+SLO_P99_MS = 50.0
+AIMD_START_OPS_PER_SEC = 50
+AIMD_INCREASE_OPS_PER_SEC = 50
+AIMD_DECREASE_FACTOR = 0.5
+# Share of the requests scheduled in a window that has to complete before the
+# window ends for it to count as sustained
+AIMD_MIN_ACHIEVED = 0.95
+AIMD_WINDOW_SECONDS = 10
+AIMD_MAX_WINDOWS = 20
+# The search stops after this many windows missed the SLO
+AIMD_MAX_DECREASES = 3
+
+# Update strategy: "read_modify_write" reads every row and puts it back,
+# "statement" runs a prepared UPDATE per key on the server
+UPDATE_STRATEGY = "read_modify_write"
+# Delete strategy: "read_delete" reads every row and deletes it by key,
+# "statement" runs DELETE FROM per table and "multi_delete" issues one
+# MultiDeleteRequest per shard key value
+DELETE_STRATEGY = "read_delete"
+# Strategies to time side by side on freshly loaded data after the main
+# phases, e.g. ["read_modify_write", "statement"]
+COMPARE_UPDATE_STRATEGIES = []
+COMPARE_DELETE_STRATEGIES = []
+
+# Maximum number of rows and KB read per query round trip, 0 keeps the
+# driver defaults
+QUERY_LIMIT = 0
+QUERY_MAX_READ_KB = 0
+
+# Write modes to compare on the same dataset after the main phases, e.g.
+# ["single", "batched"]; the comparison always uses the sharded schema
+COMPARE_WRITE_MODES = []
+
+# Schema modes to load and read full course trees with after the main phases,
+# e.g. ["flat", "hierarchy"]; every layout gets the same courses and reads
+COMPARE_SCHEMA_LAYOUTS = []
+COURSE_TREE_READS = 200
+
+# Payload sweep: the course trees are loaded and read once per size and
+# layout, with Courses.description and Lessons.content padded to the size in
+# bytes, e.g. PAYLOAD_SIZES = [100, 1000, 10000, 100000, 400000]
+PAYLOAD_SIZES = []
+# Schema modes compared at every size, "flat" stores typed columns
+PAYLOAD_LAYOUTS = ["flat", "json"]
+PAYLOAD_READS = 200
+PAYLOAD_RESULTS_FILE = "payload_sweep_OracleNoSQL.xlsx"
+PAYLOAD_PLOT_FILE = "payload_sweep_OracleNoSQL.png"
+
+TABLE_STATEMENTS = {
+    "flat": [
+        'CREATE TABLE IF NOT EXISTS Users (id STRING, name STRING, email STRING, role STRING, enrolledCourses ARRAY(STRING), PRIMARY KEY(id))',
+        'CREATE TABLE IF NOT EXISTS Courses (id STRING, title STRING, description STRING, instructor STRING, lessons ARRAY(STRING), enrollments ARRAY(STRING), PRIMARY KEY(id))',
+        'CREATE TABLE IF NOT EXISTS Lessons (id STRING, courseId STRING, title STRING, content STRING, quizzes ARRAY(STRING), PRIMARY KEY(id))',
+        'CREATE TABLE IF NOT EXISTS Quizzes (id STRING, lessonId STRING, title STRING, questions ARRAY(STRING), PRIMARY KEY(id))',
+        'CREATE TABLE IF NOT EXISTS Questions (id STRING, quizId STRING, text STRING, options ARRAY(STRING), correctAnswer STRING, PRIMARY KEY(id))',
+        'CREATE TABLE IF NOT EXISTS Enrollments (id STRING, userId STRING, courseId STRING, enrollmentDate TIMESTAMP(3), progress STRING, PRIMARY KEY(id))'
+    ],
+    "sharded": [
+        'CREATE TABLE IF NOT EXISTS Users (id STRING, name STRING, email STRING, role STRING, enrolledCourses ARRAY(STRING), PRIMARY KEY(id))',
+        'CREATE TABLE IF NOT EXISTS Courses (id STRING, title STRING, description STRING, instructor STRING, lessons ARRAY(STRING), enrollments ARRAY(STRING), PRIMARY KEY(id))',
+        'CREATE TABLE IF NOT EXISTS Lessons (id STRING, courseId STRING, title STRING, content STRING, quizzes ARRAY(STRING), PRIMARY KEY(SHARD(courseId), id))',
+        'CREATE TABLE IF NOT EXISTS Quizzes (id STRING, lessonId STRING, title STRING, questions ARRAY(STRING), PRIMARY KEY(SHARD(lessonId), id))',
+        'CREATE TABLE IF NOT EXISTS Questions (id STRING, quizId STRING, text STRING, options ARRAY(STRING), correctAnswer STRING, PRIMARY KEY(SHARD(quizId), id))',
+        'CREATE TABLE IF NOT EXISTS Enrollments (id STRING, userId STRING, courseId STRING, enrollmentDate TIMESTAMP(3), progress STRING, PRIMARY KEY(SHARD(userId), id))'
+    ],
+    # Child tables inherit the primary key of their parent, so every row of a
+    # course's subtree carries the course id as "id" and is sharded by it
+    "hierarchy": [
+        'CREATE TABLE IF NOT EXISTS Users (id STRING, name STRING, email STRING, role STRING, enrolledCourses ARRAY(STRING), PRIMARY KEY(id))',
+        'CREATE TABLE IF NOT EXISTS Courses (id STRING, title STRING, description STRING, instructor STRING, enrollments ARRAY(STRING), PRIMARY KEY(id))',
+        'CREATE TABLE IF NOT EXISTS Courses.Lessons (lessonId STRING, title STRING, content STRING, PRIMARY KEY(lessonId))',
+        'CREATE TABLE IF NOT EXISTS Courses.Lessons.Quizzes (quizId STRING, title STRING, PRIMARY KEY(quizId))',
+        'CREATE TABLE IF NOT EXISTS Courses.Lessons.Quizzes.Questions (questionId STRING, text STRING, options ARRAY(STRING), correctAnswer STRING, PRIMARY KEY(questionId))',
+        'CREATE TABLE IF NOT EXISTS Enrollments (id STRING, userId STRING, courseId STRING, enrollmentDate TIMESTAMP(3), progress STRING, PRIMARY KEY(id))'
+    ],
+    # Lessons and quizzes keep their keys and parent id typed, so the indexes
+    # still apply, and everything else in the doc column
+    "json": [
+        'CREATE TABLE IF NOT EXISTS Users (id STRING, name STRING, email STRING, role STRING, enrolledCourses ARRAY(STRING), PRIMARY KEY(id))',
+        'CREATE TABLE IF NOT EXISTS Courses (id STRING, title STRING, description STRING, instructor STRING, lessons ARRAY(STRING), enrollments ARRAY(STRING), PRIMARY KEY(id))',
+        'CREATE TABLE IF NOT EXISTS Lessons (id STRING, courseId STRING, doc JSON, PRIMARY KEY(id))',
+        'CREATE TABLE IF NOT EXISTS Quizzes (id STRING, lessonId STRING, doc JSON, PRIMARY KEY(id))',
+        'CREATE TABLE IF NOT EXISTS Questions (id STRING, quizId STRING, text STRING, options ARRAY(STRING), correctAnswer STRING, PRIMARY KEY(id))',
+        'CREATE TABLE IF NOT EXISTS Enrollments (id STRING, userId STRING, courseId STRING, enrollmentDate TIMESTAMP(3), progress STRING, PRIMARY KEY(id))'
+    ]
+}
+
+TABLES = ["Users", "Courses", "Lessons", "Quizzes", "Questions", "Enrollments"]
+
+# Child table that stores each flat table in the hierarchy schema
+CHILD_TABLES = {"Lessons": "Courses.Lessons", "Quizzes": "Courses.Lessons.Quizzes", "Questions": "Courses.Lessons.Quizzes.Questions"}
+
+# Returns the whole subtree of one course, one result row per path from the
+# course down to its deepest descendant
+COURSE_TREE_STATEMENT = 'DECLARE $id STRING; SELECT * FROM NESTED TABLES(Courses c DESCENDANTS(Courses.Lessons l, Courses.Lessons.Quizzes q, Courses.Lessons.Quizzes.Questions n)) WHERE c.id = $id'
+
+INDEXES = [
+    ("idx_lessons_courseId", "Lessons", "courseId"),
+    ("idx_quizzes_lessonId", "Quizzes", "lessonId"),
+    ("idx_questions_quizId", "Questions", "quizId"),
+    ("idx_enrollments_userId", "Enrollments", "userId"),
+    ("idx_enrollments_courseId", "Enrollments", "courseId")
+]
+
+# Field appended with "_updated" by the update phases
+UPDATE_FIELDS = {"Users": "name", "Courses": "title", "Lessons": "title", "Quizzes": "title", "Questions": "text", "Enrollments": "progress"}
+
+# Fields the json schema stores in the doc column of each table
+DOCUMENT_FIELDS = {"Lessons": ["title", "content", "quizzes"], "Quizzes": ["title", "questions"]}
+
+# Shard key column of every table whose shard key is not the id itself
+SHARD_KEYS = {
+    "flat": {},
+    "sharded": {"Lessons": "courseId", "Quizzes": "lessonId", "Questions": "quizId", "Enrollments": "userId"},
+    "hierarchy": {"Courses": "id", "Lessons": "id", "Quizzes": "id", "Questions": "id"},
+    "json": {}
+}
+
+# Primary key columns of the tables whose key is not made of the shard key and
+# the id
+PRIMARY_KEYS = {
+    "hierarchy": {
+        "Courses": ["id"],
+        "Lessons": ["id", "lessonId"],
+        "Quizzes": ["id", "lessonId", "quizId"],
+        "Questions": ["id", "lessonId", "quizId", "questionId"]
+    }
+}
+
+# Percentiles shown in the latency report
+REPORT_PERCENTILES = [50, 90, 99, 99.9]
+
+def edit_number_of_operations(multiplication=1, scale_children=False):
+    global NUM_USERS, NUM_COURSES, NUM_ENROLLMENTS_PER_USER, NUM_LESSONS_PER_COURSE, NUM_QUIZZES_PER_LESSON, NUM_QUESTIONS_PER_QUIZ
+
+    # Always scales the base amounts, so the sweep can call it once per point
+    child_multiplication = multiplication if scale_children else 1
+    NUM_USERS = BASE_COUNTS["NUM_USERS"] * multiplication
+    NUM_COURSES = BASE_COUNTS["NUM_COURSES"] * multiplication
+    NUM_ENROLLMENTS_PER_USER = BASE_COUNTS["NUM_ENROLLMENTS_PER_USER"]
+    NUM_LESSONS_PER_COURSE = BASE_COUNTS["NUM_LESSONS_PER_COURSE"] * child_multiplication
+    NUM_QUIZZES_PER_LESSON = BASE_COUNTS["NUM_QUIZZES_PER_LESSON"] * child_multiplication
+    NUM_QUESTIONS_PER_QUIZ = BASE_COUNTS["NUM_QUESTIONS_PER_QUIZ"] * child_multiplication
+
+@contextmanager
+def override(**settings):
+    # Changes settings for one comparison and restores them afterwards, also
+    # when the comparison fails
+    original = {name: globals()[name] for name in settings}
+    globals().update(settings)
+    try:
+        yield
+    finally:
+        globals().update(original)
+
+def worker_settings():
+    # Everything a spawned worker process needs to run with the settings of
+    # the parent
+    settings = {name: value for name, value in globals().items() if name.isupper()}
+    settings["kvstore_endpoint"] = kvstore_endpoint
+    return settings
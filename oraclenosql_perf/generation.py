@@ -0,0 +1,481 @@
+from . import config, lazy, metrics
+from array import array
+from itertools import chain, islice
+import os
+import pickle
+import struct
+import tempfile
+import uuid
+import time
+from datetime import datetime
+import random
+import weakref
+
+# Generated data: the Faker and bulk row generators, the compact id indexes
+# the insert phases hand on, and the pre-generated dataset.
+
+# Initialize Faker
+fake = lazy.LazyModule("faker", lambda module: module.Faker())
+vocabularies = None
+
+def generate_users():
+    for _ in range(config.NUM_USERS):
+        user = {
+            "id": fake.uuid4(),
+            "name": fake.name(),
+            "email": fake.email(),
+            "role": random.choice(["student", "instructor"]),
+            "enrolledCourses": []
+        }
+        yield "Users", user
+
+class IdIndex:
+    # Append-only sequence of UUID strings kept as 16 bytes each in one
+    # bytearray, instead of a str object and a list slot per id
+    __slots__ = ["ids"]
+
+    def __init__(self, ids=()):
+        self.ids = bytearray()
+        for id in ids:
+            self.append(id)
+
+    def append(self, id):
+        self.ids += uuid.UUID(id).bytes
+
+    def __len__(self):
+        return len(self.ids) // 16
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("IdIndex index out of range")
+        return str(uuid.UUID(bytes=bytes(self.ids[16 * index:16 * index + 16])))
+
+class StudentIndex:
+    # The students the enrollments phase writes again: ids in an IdIndex and
+    # name and email encoded back to back in one bytearray, enough to rebuild
+    # the rows without reading them back from the store
+    __slots__ = ["ids", "fields", "offsets"]
+
+    def __init__(self):
+        self.ids = IdIndex()
+        self.fields = bytearray()
+        self.offsets = array("Q", [0])
+
+    def append(self, user):
+        self.ids.append(user["id"])
+        self.fields += f"{user['name']}\0{user['email']}".encode()
+        self.offsets.append(len(self.fields))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        for index in range(len(self.ids)):
+            name, email = self.fields[self.offsets[index]:self.offsets[index + 1]].decode().split("\0")
+            yield {"id": self.ids[index], "name": name, "email": email, "role": "student", "enrolledCourses": []}
+
+def index_users(rows, instructors, students):
+    # Passes the user rows through to the writer and keeps the instructors'
+    # ids and the students
+    for table, row in rows:
+        if row["role"] == "instructor":
+            instructors.append(row["id"])
+        else:
+            students.append(row)
+        yield table, row
+
+def index_courses(rows, course_ids):
+    for table, row in rows:
+        if table == "Courses":
+            course_ids.append(row["id"])
+        yield table, row
+
+def generate_courses(instructors):
+    for _ in range(config.NUM_COURSES):
+        course = {
+            "id": fake.uuid4(),
+            "title": fake.catch_phrase(),
+            "description": fake.text(),
+            "instructor": random.choice(instructors),
+            "lessons": [],
+            "enrollments": []
+        }
+
+        # Generate Lessons for each course
+        for _ in range(config.NUM_LESSONS_PER_COURSE):
+            lesson = {
+                "id": fake.uuid4(),
+                "courseId": course["id"],
+                "title": fake.sentence(),
+                "content": fake.text(),
+                "quizzes": []
+            }
+
+            # Generate Quizzes for each lesson
+            for _ in range(config.NUM_QUIZZES_PER_LESSON):
+                quiz = {
+                    "id": fake.uuid4(),
+                    "lessonId": lesson["id"],
+                    "title": fake.sentence(),
+                    "questions": []
+                }
+
+                # Generate Questions for each quiz
+                for _ in range(config.NUM_QUESTIONS_PER_QUIZ):
+                    question = {
+                        "id": fake.uuid4(),
+                        "quizId": quiz["id"],
+                        "text": fake.sentence(),
+                        "options": [fake.word() for __ in range(4)],
+                        "correctAnswer": fake.word()
+                    }
+                    quiz["questions"].append(question["id"])
+                    # Insert question into Questions table
+                    yield "Questions", question
+                lesson["quizzes"].append(quiz["id"])
+                # Insert quiz into Quizzes table
+                yield "Quizzes", quiz
+            course["lessons"].append(lesson["id"])
+            # Insert lesson into Lessons table
+            yield "Lessons", lesson
+        # Insert course into Courses table
+        yield "Courses", course
+
+def generate_enrollments(users, course_ids):
+    for user in users:
+        if user["role"] == "student":
+            # Sampling positions leaves the course ids where they are
+            enrolled_courses = [course_ids[index] for index in random.sample(range(len(course_ids)), config.NUM_ENROLLMENTS_PER_USER)]
+            user["enrolledCourses"] = enrolled_courses
+            yield "Users", user
+            for course_id in enrolled_courses:
+                enrollment = {
+                    "id": fake.uuid4(),
+                    "userId": user["id"],
+                    "courseId": course_id,
+                    "enrollmentDate": fake.date_time_this_year(),
+                    "progress": random.choice(["not started", "in progress", "completed"])
+                }
+                yield "Enrollments", enrollment
+
+def get_vocabularies():
+    global vocabularies
+    if vocabularies is None:
+        vocabulary_fake = lazy.faker.Faker()
+        vocabulary_fake.seed_instance(config.VOCABULARY_SEED)
+        vocabularies = {
+            "name": [vocabulary_fake.name() for _ in range(config.VOCABULARY_SIZE)],
+            "email": [vocabulary_fake.email() for _ in range(config.VOCABULARY_SIZE)],
+            "catch_phrase": [vocabulary_fake.catch_phrase() for _ in range(config.VOCABULARY_SIZE)],
+            "sentence": [vocabulary_fake.sentence() for _ in range(config.VOCABULARY_SIZE)],
+            "text": [vocabulary_fake.text() for _ in range(config.VOCABULARY_SIZE)],
+            "word": [vocabulary_fake.word() for _ in range(config.VOCABULARY_SIZE)]
+        }
+    return vocabularies
+
+def sample_vocabulary(rng, vocabulary, size):
+    words = get_vocabularies()[vocabulary]
+    return [words[index] for index in rng.integers(0, len(words), size=size).ravel()]
+
+def bulk_uuid4(rng, size):
+    # Random version 4 UUIDs formatted from one block of random bytes
+    raw = lazy.np.frombuffer(rng.bytes(16 * size), dtype=lazy.np.uint8).reshape(size, 16).copy()
+    raw[:, 6] = (raw[:, 6] & 0x0F) | 0x40
+    raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80
+    digits = raw.tobytes().hex()
+    uuids = []
+    for start in range(0, 32 * size, 32):
+        uuid = digits[start:start + 32]
+        uuids.append(f"{uuid[:8]}-{uuid[8:12]}-{uuid[12:16]}-{uuid[16:20]}-{uuid[20:]}")
+    return uuids
+
+def generate_users_bulk(rng=None):
+    rng = rng if rng is not None else lazy.np.random.default_rng()
+    ids = bulk_uuid4(rng, config.NUM_USERS)
+    names = sample_vocabulary(rng, "name", config.NUM_USERS)
+    emails = sample_vocabulary(rng, "email", config.NUM_USERS)
+    roles = rng.choice(["student", "instructor"], size=config.NUM_USERS).tolist()
+    for i in range(config.NUM_USERS):
+        yield "Users", {"id": ids[i], "name": names[i], "email": emails[i], "role": roles[i], "enrolledCourses": []}
+
+def generate_courses_bulk(instructors, rng=None):
+    rng = rng if rng is not None else lazy.np.random.default_rng()
+    if not instructors:
+        raise IndexError("Cannot choose from an empty sequence")
+    lessons_per_course = config.NUM_LESSONS_PER_COURSE
+    quizzes_per_lesson = config.NUM_QUIZZES_PER_LESSON
+    questions_per_quiz = config.NUM_QUESTIONS_PER_QUIZ
+    for chunk_start in range(0, config.NUM_COURSES, config.BULK_CHUNK_COURSES):
+        num_courses = min(config.BULK_CHUNK_COURSES, config.NUM_COURSES - chunk_start)
+        num_lessons = num_courses * lessons_per_course
+        num_quizzes = num_lessons * quizzes_per_lesson
+        num_questions = num_quizzes * questions_per_quiz
+
+        course_ids = bulk_uuid4(rng, num_courses)
+        course_titles = sample_vocabulary(rng, "catch_phrase", num_courses)
+        course_descriptions = sample_vocabulary(rng, "text", num_courses)
+        course_instructors = [instructors[index] for index in rng.integers(0, len(instructors), size=num_courses)]
+        lesson_ids = bulk_uuid4(rng, num_lessons)
+        lesson_titles = sample_vocabulary(rng, "sentence", num_lessons)
+        lesson_contents = sample_vocabulary(rng, "text", num_lessons)
+        quiz_ids = bulk_uuid4(rng, num_quizzes)
+        quiz_titles = sample_vocabulary(rng, "sentence", num_quizzes)
+        question_ids = bulk_uuid4(rng, num_questions)
+        question_texts = sample_vocabulary(rng, "sentence", num_questions)
+        # Four options and the correct answer for every question
+        question_words = sample_vocabulary(rng, "word", (num_questions, 5))
+
+        # Same rows in the same order as generate_courses
+        for c in range(num_courses):
+            course_lessons = lesson_ids[c * lessons_per_course:(c + 1) * lessons_per_course]
+            for l in range(c * lessons_per_course, (c + 1) * lessons_per_course):
+                lesson_quizzes = quiz_ids[l * quizzes_per_lesson:(l + 1) * quizzes_per_lesson]
+                for q in range(l * quizzes_per_lesson, (l + 1) * quizzes_per_lesson):
+                    quiz_questions = question_ids[q * questions_per_quiz:(q + 1) * questions_per_quiz]
+                    for n in range(q * questions_per_quiz, (q + 1) * questions_per_quiz):
+                        words = question_words[5 * n:5 * n + 5]
+                        yield "Questions", {"id": question_ids[n], "quizId": quiz_ids[q], "text": question_texts[n], "options": words[:4], "correctAnswer": words[4]}
+                    yield "Quizzes", {"id": quiz_ids[q], "lessonId": lesson_ids[l], "title": quiz_titles[q], "questions": quiz_questions}
+                yield "Lessons", {"id": lesson_ids[l], "courseId": course_ids[c], "title": lesson_titles[l], "content": lesson_contents[l], "quizzes": lesson_quizzes}
+            yield "Courses", {"id": course_ids[c], "title": course_titles[c], "description": course_descriptions[c], "instructor": course_instructors[c], "lessons": course_lessons, "enrollments": []}
+
+def generate_enrollments_bulk(users, course_ids, rng=None):
+    rng = rng if rng is not None else lazy.np.random.default_rng()
+    if config.NUM_ENROLLMENTS_PER_USER > len(course_ids):
+        raise ValueError("Sample larger than population or is negative")
+    now = datetime.now().replace(microsecond=0)
+    year_start = lazy.np.datetime64(now.replace(month=1, day=1, hour=0, minute=0, second=0), 's')
+    span = int((lazy.np.datetime64(now, 's') - year_start).astype(int)) + 1
+    # The users are streamed, so the columns are built for one chunk of
+    # students at a time
+    students = []
+    for user in chain((user for user in users if user["role"] == "student"), [None]):
+        if user is not None:
+            students.append(user)
+            if len(students) < config.BULK_CHUNK_USERS:
+                continue
+        if not students:
+            break
+        num_students = len(students)
+        num_enrollments = num_students * config.NUM_ENROLLMENTS_PER_USER
+
+        # Distinct courses per student: draw with replacement and redraw the
+        # students that got the same course twice
+        picks = rng.integers(0, len(course_ids), size=(num_students, config.NUM_ENROLLMENTS_PER_USER))
+        if config.NUM_ENROLLMENTS_PER_USER > 1:
+            while True:
+                sorted_picks = lazy.np.sort(picks, axis=1)
+                duplicates = (sorted_picks[:, 1:] == sorted_picks[:, :-1]).any(axis=1)
+                if not duplicates.any():
+                    break
+                picks[duplicates] = rng.integers(0, len(course_ids), size=(int(duplicates.sum()), config.NUM_ENROLLMENTS_PER_USER))
+
+        enrollment_ids = bulk_uuid4(rng, num_enrollments)
+        enrollment_dates = (year_start + rng.integers(0, span, size=num_enrollments).astype('timedelta64[s]')).tolist()
+        progress = rng.choice(["not started", "in progress", "completed"], size=num_enrollments).tolist()
+
+        for s, student in enumerate(students):
+            enrolled_courses = [course_ids[index] for index in picks[s]]
+            student["enrolledCourses"] = enrolled_courses
+            yield "Users", student
+            for e, course_id in enumerate(enrolled_courses, s * config.NUM_ENROLLMENTS_PER_USER):
+                yield "Enrollments", {"id": enrollment_ids[e], "userId": student["id"], "courseId": course_id, "enrollmentDate": enrollment_dates[e], "progress": progress[e]}
+        students = []
+
+def get_generators(rng=None):
+    if config.DATA_GENERATOR == "bulk":
+        return (lambda: generate_users_bulk(rng),
+                lambda instructors: generate_courses_bulk(instructors, rng),
+                lambda users, course_ids: generate_enrollments_bulk(users, course_ids, rng))
+    return generate_users, generate_courses, generate_enrollments
+
+def benchmark_generators():
+    start_time = time.perf_counter()
+    get_vocabularies()
+    print(f"Bulk generator vocabularies built in {time.perf_counter() - start_time:.2f} seconds")
+    for generator in ["faker", "bulk"]:
+        with config.override(DATA_GENERATOR=generator):
+            users_generator, courses_generator, enrollments_generator = get_generators()
+            start_time = time.perf_counter()
+            instructors = IdIndex()
+            students = StudentIndex()
+            course_ids = IdIndex()
+            rows = 0
+            for _ in index_users(users_generator(), instructors, students):
+                rows += 1
+            for _ in index_courses(courses_generator(instructors), course_ids):
+                rows += 1
+            for _ in enrollments_generator(students, course_ids):
+                rows += 1
+            duration = time.perf_counter() - start_time
+            rows_per_sec = rows / duration if duration > 0 else 0.0
+            metrics.generator_stats.append((generator, rows, duration, rows_per_sec))
+            print(f"{generator} generator: {rows} rows in {duration:.2f} seconds ({rows_per_sec:.1f} rows/sec)")
+
+class Dataset:
+    # Rows of the users, courses and enrollments phases in a file of packed
+    # chunks of at most DATASET_CHUNK_ROWS rows each. The offsets of the
+    # chunks are in an index at the end of the file, so the phases read one
+    # chunk at a time and never hold the whole dataset. A temporary dataset
+    # removes its file once it is no longer used
+    def __init__(self, path, temporary=False):
+        self.path = path
+        with open(path, "rb") as f:
+            f.seek(-8, os.SEEK_END)
+            f.seek(struct.unpack("<Q", f.read(8))[0])
+            self.chunks = pickle.load(f)
+        if temporary:
+            weakref.finalize(self, os.remove, path)
+
+    def __len__(self):
+        return sum(rows for chunks in self.chunks.values() for _, rows in chunks)
+
+    def rows(self, section):
+        with open(self.path, "rb") as f:
+            for offset, _ in self.chunks[section]:
+                f.seek(offset)
+                yield from unpack_rows(pickle.load(f))
+
+class DatasetPartition:
+    # The rows of a dataset one worker process inserts, picked out while they
+    # are read: a course and its whole subtree go to the same partition, and
+    # a student's enrollments go to the partition that holds the student
+    def __init__(self, dataset, index, partitions):
+        self.dataset = dataset
+        self.index = index
+        self.partitions = partitions
+
+    def rows(self, section):
+        if section == "users":
+            for position, row in enumerate(self.dataset.rows("users")):
+                if position % self.partitions == self.index:
+                    yield row
+        elif section == "courses":
+            course = 0
+            for table, row in self.dataset.rows("courses"):
+                if course % self.partitions == self.index:
+                    yield table, row
+                if table == "Courses":
+                    course += 1
+        else:
+            # The enrollments rewrite the students in the order of the users
+            # section, so reading both side by side finds each student's position
+            users = enumerate(self.dataset.rows("users"))
+            partition = None
+            for table, row in self.dataset.rows("enrollments"):
+                if table == "Users":
+                    for position, (_, user) in users:
+                        if user["id"] == row["id"]:
+                            partition = position % self.partitions
+                            break
+                if partition == self.index:
+                    yield table, row
+
+def partition_dataset(dataset, partitions):
+    return [DatasetPartition(dataset, index, partitions) for index in range(partitions)]
+
+def latest_rows(dataset):
+    # Final state of every row of the dataset. The enrollments rewrite the
+    # students in the order of the users section, so the users they rewrite
+    # are skipped by reading both side by side
+    rewritten = (row["id"] for table, row in dataset.rows("enrollments") if table == "Users")
+    next_id = next(rewritten, None)
+    for table, row in dataset.rows("users"):
+        if row["id"] == next_id:
+            next_id = next(rewritten, None)
+        else:
+            yield table, row
+    yield from dataset.rows("courses")
+    yield from dataset.rows("enrollments")
+
+def pack_rows(rows):
+    # Stores a sequence of (table, row) pairs column by column: the table of
+    # every row as one byte and the values of each table as one list per column
+    order = bytearray()
+    columns = {}
+    for table, row in rows:
+        table_columns = columns.get(table)
+        if table_columns is None:
+            table_columns = columns[table] = {column: [] for column in row}
+        order.append(config.TABLES.index(table))
+        for column, values in table_columns.items():
+            values.append(row[column])
+    return {"order": bytes(order), "columns": columns}
+
+def unpack_rows(packed):
+    # Rebuilds the rows one at a time from the columns
+    columns = {table: (list(table_columns), zip(*table_columns.values())) for table, table_columns in packed["columns"].items()}
+    for index in packed["order"]:
+        table = config.TABLES[index]
+        names, values = columns[table]
+        yield table, dict(zip(names, next(values)))
+
+def dataset_rows(dataset):
+    return chain(dataset.rows("users"), dataset.rows("courses"), dataset.rows("enrollments"))
+
+def write_section(f, rows):
+    # Appends the rows in packed chunks, returns the offset and the number of
+    # rows of every chunk
+    chunks = []
+    rows = iter(rows)
+    while True:
+        packed = pack_rows(islice(rows, config.DATASET_CHUNK_ROWS))
+        if not packed["order"]:
+            return chunks
+        chunks.append((f.tell(), len(packed["order"])))
+        pickle.dump(packed, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+def write_dataset(path, users, courses, enrollments):
+    # The sections are written one after another, so each one may be
+    # generated from what the ones before it handed on
+    with open(path, "wb") as f:
+        chunks = {"users": write_section(f, users)}
+        chunks["courses"] = write_section(f, courses)
+        chunks["enrollments"] = write_section(f, enrollments)
+        index_offset = f.tell()
+        pickle.dump(chunks, f, protocol=pickle.HIGHEST_PROTOCOL)
+        f.write(struct.pack("<Q", index_offset))
+
+def generate_dataset(seed=None, path=None):
+    # Writes the dataset to path, or to a temporary file when no path is given
+    if seed is not None:
+        random.seed(seed)
+        lazy.faker.Faker.seed(seed)
+    temporary = path is None
+    if temporary:
+        fd, path = tempfile.mkstemp(prefix="dataset_")
+        os.close(fd)
+    users_generator, courses_generator, enrollments_generator = get_generators(lazy.np.random.default_rng(seed))
+    # Generated while it is written, like insert_all_data streams it: only
+    # the compact indexes the sections hand on are kept
+    instructors = IdIndex()
+    students = StudentIndex()
+    course_ids = IdIndex()
+    write_dataset(path, index_users(users_generator(), instructors, students), index_courses(courses_generator(instructors), course_ids),
+                  enrollments_generator(students, course_ids))
+    return Dataset(path, temporary)
+
+def get_dataset_path(seed):
+    name = f"dataset_{config.DATA_GENERATOR}_seed{seed}_users{config.NUM_USERS}_courses{config.NUM_COURSES}_{config.NUM_LESSONS_PER_COURSE}x{config.NUM_QUIZZES_PER_LESSON}x{config.NUM_QUESTIONS_PER_QUIZ}_enrollments{config.NUM_ENROLLMENTS_PER_USER}.chunks"
+    return os.path.join(config.DATASET_DIR, name)
+
+def load_dataset(seed=None):
+    # The seed is read at call time, like every other setting
+    seed = seed if seed is not None else config.DATASET_SEED
+    path = get_dataset_path(seed)
+    start_time = time.perf_counter()
+    if os.path.exists(path):
+        dataset = Dataset(path)
+        print(f"Dataset of {len(dataset)} rows opened from {path} in {time.perf_counter() - start_time:.2f} seconds")
+        return dataset
+    os.makedirs(config.DATASET_DIR, exist_ok=True)
+    # Written under another name first, so that an interrupted run does not
+    # leave a partial dataset behind for the next one
+    partial_path = path + ".partial"
+    generate_dataset(seed, partial_path)
+    os.replace(partial_path, path)
+    dataset = Dataset(path)
+    print(f"Dataset of {len(dataset)} rows generated and saved to {path} in {time.perf_counter() - start_time:.2f} seconds")
+    return dataset
@@ -0,0 +1,28 @@
+import importlib
+
+# Stand-ins for the optional imports of the reports and the data generators.
+
+class LazyModule:
+    # Stands in for a module, or for an object built from it, and imports it
+    # on first use. matplotlib, pandas, numpy and Faker take seconds to import,
+    # so runs that do not plot, export to Excel or generate data skip them. The
+    # stand-in's own attributes are underscored so they never shadow the
+    # target's, fake.name() must reach Faker
+    def __init__(self, name, build=None):
+        self._name = name
+        self._build = build
+        self._target = None
+
+    def __getattr__(self, attribute):
+        if attribute.startswith("__"):
+            # copy and pickle probe special methods before __init__ has run
+            raise AttributeError(attribute)
+        if self._target is None:
+            module = importlib.import_module(self._name)
+            self._target = self._build(module) if self._build is not None else module
+        return getattr(self._target, attribute)
+
+faker = LazyModule("faker")
+plt = LazyModule("matplotlib.pyplot")
+np = LazyModule("numpy")
+pd = LazyModule("pandas")
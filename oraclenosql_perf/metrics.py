@@ -0,0 +1,332 @@
+from . import config
+from contextlib import contextmanager
+import cProfile
+import multiprocessing
+import os
+import re
+try:
+    import resource
+except ImportError:
+    resource = None
+import threading
+import time
+import pstats
+import sys
+import tracemalloc
+
+# What the phases measure: durations, latency histograms per (phase,
+# operation, table), request CPU time, profiles and peak RSS, and the result
+# lists the reports are built from.
+
+timings = []
+throughputs = []
+query_stats = []
+generator_stats = []
+async_stats = []
+index_stats = []
+layout_stats = []
+cache_stats = []
+mixed_stats = []
+retry_stats = []
+max_throughput_stats = []
+sweep_stats = []
+profile_stats = []
+memory_stats = []
+payload_stats = []
+
+# Latency histograms keyed by (phase, operation, table). histograms hold
+# whole requests, from the first attempt or the intended arrival to the end
+# of the attempt that succeeded, including pacing, backoff and failed
+# attempts; service_histograms hold the attempt that succeeded only
+histograms = {}
+service_histograms = {}
+histograms_lock = threading.Lock()
+current_phase = None
+
+# Request wall and CPU time keyed by (phase, operation, table)
+request_times = {}
+request_times_lock = threading.Lock()
+profiling_active = False
+
+# Peak RSS of the phases measure_time is in, innermost last
+phase_peak_rss = []
+
+class LatencyHistogram:
+    # Log-linear buckets in the style of HdrHistogram: every power of two is
+    # split into 2 ** (SUB_BUCKET_BITS - 1) linear buckets, so recording is a
+    # couple of integer operations. A bucket spans at most 1/128 of its
+    # values and reports its upper edge, so the relative error stays below 0.8%
+    SUB_BUCKET_BITS = 8
+
+    def __init__(self):
+        self.counts = [0] * ((64 - self.SUB_BUCKET_BITS + 1) << self.SUB_BUCKET_BITS)
+        self.count = 0
+        self.min = None
+        self.max = 0
+        self.first_start = None
+        self.last_end = None
+
+    def record(self, start_ns, end_ns):
+        value = end_ns - start_ns
+        shift = max(value.bit_length() - self.SUB_BUCKET_BITS, 0)
+        self.counts[(shift << self.SUB_BUCKET_BITS) + (value >> shift)] += 1
+        self.count += 1
+        if self.min is None or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        if self.first_start is None or start_ns < self.first_start:
+            self.first_start = start_ns
+        if self.last_end is None or end_ns > self.last_end:
+            self.last_end = end_ns
+
+    def merge(self, other):
+        for index, count in enumerate(other.counts):
+            if count:
+                self.counts[index] += count
+        self.count += other.count
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        self.max = max(self.max, other.max)
+        if other.first_start is not None and (self.first_start is None or other.first_start < self.first_start):
+            self.first_start = other.first_start
+        if other.last_end is not None and (self.last_end is None or other.last_end > self.last_end):
+            self.last_end = other.last_end
+
+    def bucket_value(self, index):
+        # Highest value that falls into the bucket, capped at the recorded max
+        shift = index >> self.SUB_BUCKET_BITS
+        sub_bucket = index & ((1 << self.SUB_BUCKET_BITS) - 1)
+        return min(((sub_bucket + 1) << shift) - 1, self.max)
+
+    def percentile(self, percentile):
+        if self.count == 0:
+            return 0
+        threshold = max(1, -(-self.count * percentile // 100))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= threshold:
+                return self.bucket_value(index)
+        return self.max
+
+    def cdf(self):
+        seen = 0
+        points = []
+        for index, count in enumerate(self.counts):
+            if count:
+                seen += count
+                points.append((self.bucket_value(index), seen / self.count))
+        return points
+
+    def ops_per_sec(self):
+        if self.count == 0 or self.last_end <= self.first_start:
+            return 0.0
+        return self.count / ((self.last_end - self.first_start) / 1e9)
+
+def record_latency(operation, table, start_ns, end_ns, phase=None, service=False):
+    # Requests issued outside of a measured phase are not recorded
+    phase = phase if phase is not None else current_phase
+    if phase is None:
+        return
+    key = (phase, operation, table)
+    target = service_histograms if service else histograms
+    with histograms_lock:
+        histogram = target.get(key)
+        if histogram is None:
+            histogram = target[key] = LatencyHistogram()
+        histogram.record(start_ns, end_ns)
+
+def record_request_time(operation, table, wall_ns, cpu_ns):
+    if current_phase is None:
+        return
+    key = (current_phase, operation, table)
+    with request_times_lock:
+        times = request_times.get(key)
+        if times is None:
+            times = request_times[key] = [0, 0, 0]
+        times[0] += 1
+        times[1] += wall_ns
+        times[2] += cpu_ns
+
+def report_latencies(phase):
+    with histograms_lock:
+        phase_histograms = [(key, histogram, service_histograms.get(key)) for key, histogram in histograms.items() if key[0] == phase]
+    if not phase_histograms:
+        return
+    header = " ".join(f"{'p' + format(percentile, 'g'):>9}" for percentile in config.REPORT_PERCENTILES)
+    print(f"{phase} latency (ms):")
+    print(f"  {'operation':<15} {'table':<12} {'count':>8} {'ops/sec':>10} {header} {'max':>9} {'svc p99':>9}")
+    for (_, operation, table), histogram, service in phase_histograms:
+        values = " ".join(f"{histogram.percentile(percentile) / 1e6:>9.3f}" for percentile in config.REPORT_PERCENTILES)
+        service_text = f"{service.percentile(99) / 1e6:>9.3f}" if service is not None else f"{'-':>9}"
+        print(f"  {operation:<15} {table or '-':<12} {histogram.count:>8} {histogram.ops_per_sec():>10.1f} {values} {histogram.max / 1e6:>9.3f} {service_text}")
+
+def get_profile_path(phase, suffix):
+    name = f"OracleNoSQL_users{config.NUM_USERS}_courses{config.NUM_COURSES}_{re.sub(r'[^A-Za-z0-9]+', '_', phase).strip('_')}"
+    if multiprocessing.parent_process() is not None:
+        name += f"_worker{os.getpid()}"
+    return os.path.join(config.PROFILE_DIR, name + suffix)
+
+def report_request_times(phase, wall_seconds, process_cpu_seconds):
+    with request_times_lock:
+        phase_times = [(key, times) for key, times in request_times.items() if key[0] == phase]
+    if not phase_times:
+        return None
+    print(f"{phase} request time split (seconds):")
+    print(f"  {'operation':<15} {'table':<12} {'count':>8} {'wall':>9} {'client cpu':>10} {'waiting':>9}")
+    request_wall = 0
+    request_cpu = 0
+    for (_, operation, table), (count, wall_ns, cpu_ns) in phase_times:
+        request_wall += wall_ns
+        request_cpu += cpu_ns
+        print(f"  {operation:<15} {table or '-':<12} {count:>8} {wall_ns / 1e9:>9.3f} {cpu_ns / 1e9:>10.3f} {(wall_ns - cpu_ns) / 1e9:>9.3f}")
+    # Everything the process spent on CPU outside the handle calls belongs to
+    # the harness itself: data generation, row building, bookkeeping
+    harness_cpu = process_cpu_seconds - request_cpu / 1e9
+    print(f"  Phase: {wall_seconds:.3f} wall, {process_cpu_seconds:.3f} process cpu, {request_cpu / 1e9:.3f} driver cpu in requests, "
+          f"{(request_wall - request_cpu) / 1e9:.3f} waiting in requests, {harness_cpu:.3f} harness cpu outside requests")
+    return request_wall / 1e9, request_cpu / 1e9
+
+@contextmanager
+def profile_phase(phase):
+    global profiling_active
+    # Nested phases are covered by the profile of the outer one
+    if profiling_active or not (config.PROFILE_PHASES or config.TRACE_ALLOCATIONS or config.SPLIT_REQUEST_TIME):
+        yield
+        return
+    profiling_active = True
+    profiler = cProfile.Profile() if config.PROFILE_PHASES else None
+    started_tracing = config.TRACE_ALLOCATIONS and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    if config.TRACE_ALLOCATIONS:
+        tracemalloc.reset_peak()
+    start_time = time.perf_counter()
+    start_cpu = time.process_time()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        wall_seconds = time.perf_counter() - start_time
+        process_cpu_seconds = time.process_time() - start_cpu
+        profiling_active = False
+        os.makedirs(config.PROFILE_DIR, exist_ok=True)
+        profile_path = None
+        if profiler is not None:
+            profile_path = get_profile_path(phase, ".prof")
+            profiler.dump_stats(profile_path)
+            with open(get_profile_path(phase, "_profile.txt"), "w") as f:
+                pstats.Stats(profiler, stream=f).sort_stats("cumulative").print_stats(config.PROFILE_TOP_FUNCTIONS)
+            print(f"Profile of {phase} saved to {profile_path}")
+        peak_mb = None
+        if config.TRACE_ALLOCATIONS:
+            peak_mb = tracemalloc.get_traced_memory()[1] / 2 ** 20
+            top_allocators = tracemalloc.take_snapshot().statistics("lineno")[:config.PROFILE_TOP_ALLOCATORS]
+            if started_tracing:
+                tracemalloc.stop()
+            allocations_path = get_profile_path(phase, "_allocations.txt")
+            with open(allocations_path, "w") as f:
+                f.write(f"Peak traced memory: {peak_mb:.2f} MB\n")
+                for statistic in top_allocators:
+                    f.write(f"{statistic}\n")
+            print(f"{phase} peak traced memory {peak_mb:.2f} MB, top allocators saved to {allocations_path}")
+        request_split = report_request_times(phase, wall_seconds, process_cpu_seconds) if config.SPLIT_REQUEST_TIME else None
+        request_wall, request_cpu = request_split if request_split is not None else (None, None)
+        profile_stats.append((phase, wall_seconds, process_cpu_seconds, request_wall, request_cpu,
+                              request_wall - request_cpu if request_split is not None else None, peak_mb, profile_path))
+
+def get_rss_mb(field):
+    # VmRSS is the current and VmHWM the peak resident set size
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    # Without /proc only the peak of the whole process is known, in KB on
+    # Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 1024
+
+def reset_peak_rss():
+    # Linux restarts VmHWM from the current RSS when "5" is written
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+def start_rss_tracking():
+    # Resetting the peak would lose the peak of the enclosing phase so far
+    if phase_peak_rss:
+        phase_peak_rss[-1] = max(phase_peak_rss[-1] or 0, get_rss_mb("VmHWM") or 0)
+    reset_peak_rss()
+    phase_peak_rss.append(0)
+    return get_rss_mb("VmRSS")
+
+def stop_rss_tracking():
+    peak = max(phase_peak_rss.pop(), get_rss_mb("VmHWM") or 0)
+    if phase_peak_rss:
+        phase_peak_rss[-1] = max(phase_peak_rss[-1], peak)
+    return peak
+
+@contextmanager
+def measuring(phase):
+    # Requests made inside the block are recorded under phase
+    global current_phase
+    original_phase = current_phase
+    current_phase = phase
+    try:
+        yield
+    finally:
+        current_phase = original_phase
+
+@contextmanager
+def measured_phase(operation_name):
+    # Times the block as a phase and reports its duration, peak RSS and
+    # latencies; the async runner awaits inside it
+    start_rss = start_rss_tracking()
+    start_time = time.perf_counter()
+    try:
+        with measuring(operation_name), profile_phase(operation_name):
+            yield
+    finally:
+        peak_rss = stop_rss_tracking()
+    end_time = time.perf_counter()
+    duration = end_time - start_time
+    timings.append((operation_name, duration))
+    memory_stats.append((operation_name, start_rss, peak_rss))
+    print(f"{operation_name} took {duration:.2f} seconds, peak RSS {peak_rss:.1f} MB")
+    report_latencies(operation_name)
+
+def measure_time(operation_name, func):
+    with measured_phase(operation_name):
+        func()
+
+def merge_latencies(phase, exclude=(), service=False):
+    # One histogram of every request of the phase except the operations in
+    # exclude, either their whole latencies or their service times only
+    with histograms_lock:
+        phase_histograms = [histogram for (key_phase, operation, _), histogram in (service_histograms if service else histograms).items()
+                            if key_phase == phase and operation not in exclude]
+    merged = LatencyHistogram()
+    for histogram in phase_histograms:
+        merged.merge(histogram)
+    return merged
+
+def latency_rows():
+    rows = []
+    with histograms_lock:
+        for key, histogram in histograms.items():
+            phase, operation, table = key
+            percentiles = [histogram.percentile(percentile) / 1e6 for percentile in config.REPORT_PERCENTILES]
+            service = service_histograms.get(key)
+            rows.append([phase, operation, table, histogram.count, histogram.ops_per_sec()] + percentiles + [histogram.max / 1e6, service.percentile(99) / 1e6 if service is not None else None])
+    return rows
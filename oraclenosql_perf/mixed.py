@@ -0,0 +1,205 @@
+from borneo import GetRequest, PutRequest
+from . import config, metrics, rate_control, schema, workload
+from bisect import bisect_left
+from concurrent.futures import wait
+from itertools import accumulate
+import uuid
+import time
+import random
+
+# Open-loop mixed workload and the AIMD search for the max sustainable
+# throughput.
+
+class KeyChooser:
+    # Draws indexes into a list of keys that may grow while it is used; the
+    # Zipf ranks cover the keys that existed when the chooser was built
+    def __init__(self, distribution, size, exponent):
+        self.distribution = distribution
+        self.size = size
+        self.cum_weights = list(accumulate(1 / rank ** exponent for rank in range(1, size + 1)))
+        # Scrambles the ranks so that the hot keys are spread over the table
+        self.permutation = list(range(size))
+        random.shuffle(self.permutation)
+
+    def zipf_rank(self):
+        return bisect_left(self.cum_weights, random.random() * self.cum_weights[-1])
+
+    def choose(self, length):
+        if self.distribution == "uniform":
+            return random.randrange(length)
+        if self.distribution == "latest":
+            return max(length - 1 - self.zipf_rank(), 0)
+        return self.permutation[self.zipf_rank()]
+
+def load_workload_keys(handle):
+    keys = {}
+    templates = {}
+    for table in config.MIXED_TABLE_WEIGHTS:
+        key_fields = schema.get_key_fields(table)
+        keys[table] = [dict(result) for result in workload.query_rows(handle, f"SELECT {', '.join(key_fields)} FROM {schema.get_table_name(table)}", table)]
+        for result in workload.query_rows(handle, f"SELECT * FROM {schema.get_table_name(table)} LIMIT 1", table):
+            templates[table] = dict(result)
+    return keys, templates
+
+def run_mixed_operation(phase, kind, table, value, keys, intended_ns):
+    handle = workload.worker_state.handle
+    service_ns = 0
+
+    def call(request_call, request):
+        nonlocal service_ns
+        result, _, start_ns, end_ns, _ = rate_control.attempt_with_retry(table, request_call, request)
+        service_ns += end_ns - start_ns
+        return result
+
+    start_ns = time.perf_counter_ns()
+    if kind == "read":
+        request = GetRequest().set_table_name(schema.get_table_name(table)).set_key(value)
+        call(handle.get, request)
+    elif kind == "update":
+        get_request = GetRequest().set_table_name(schema.get_table_name(table)).set_key(value)
+        record = call(handle.get, get_request).get_value()
+        if record is not None:
+            record = schema.mark_updated(table, record)
+            call(handle.put, PutRequest().set_table_name(schema.get_table_name(table)).set_value(record))
+    else:
+        call(handle.put, PutRequest().set_table_name(schema.get_table_name(table)).set_value(value))
+        keys.append(schema.get_primary_key(table, value))
+    end_ns = time.perf_counter_ns()
+    # Latency counts from the intended arrival, so time spent queued behind
+    # slow requests, paced or backing off is not hidden; service time only
+    # counts the attempts that succeeded
+    metrics.record_latency(kind, table, intended_ns, end_ns, phase)
+    metrics.record_latency(kind, table, start_ns, start_ns + service_ns, phase, service=True)
+    return end_ns
+
+def prepare_mixed_workload(handle):
+    keys, templates = load_workload_keys(handle)
+    tables = [table for table in config.MIXED_TABLE_WEIGHTS if keys[table]]
+    if not tables:
+        return None
+    return {
+        "keys": keys,
+        "templates": templates,
+        "tables": tables,
+        "table_weights": [config.MIXED_TABLE_WEIGHTS[table] for table in tables],
+        "kinds": list(config.MIXED_WORKLOAD_MIX),
+        "kind_weights": list(config.MIXED_WORKLOAD_MIX.values()),
+        "choosers": {table: KeyChooser(config.MIXED_KEY_DISTRIBUTION, len(keys[table]), config.MIXED_ZIPF_EXPONENT) for table in tables}
+    }
+
+def run_open_loop(mix, rate, windows):
+    # Issues requests at the given rate for the (phase, seconds) windows one
+    # after another and returns the number of requests scheduled per window
+    # and the number of them that completed before their window ended
+    keys = mix["keys"]
+    executor = workload.get_write_executor()
+    interval_ns = 1e9 / rate
+    intended_ns = time.perf_counter_ns()
+    pending = {}
+    scheduled = {}
+    completed = {}
+    window_ends = {}
+    max_lag_ns = 0
+
+    def collect(done):
+        for future in done:
+            phase = pending.pop(future)
+            if future.result() <= window_ends[phase]:
+                completed[phase] += 1
+
+    for phase, seconds in windows:
+        scheduled[phase] = 0
+        completed[phase] = 0
+        window_end_ns = window_ends[phase] = intended_ns + int(seconds * 1e9)
+        while intended_ns < window_end_ns:
+            now_ns = time.perf_counter_ns()
+            if intended_ns > now_ns:
+                time.sleep((intended_ns - now_ns) / 1e9)
+            max_lag_ns = max(max_lag_ns, time.perf_counter_ns() - intended_ns)
+            kind = random.choices(mix["kinds"], mix["kind_weights"])[0]
+            table = random.choices(mix["tables"], mix["table_weights"])[0]
+            if kind == "insert":
+                # A copy of an existing row under a new id
+                value = dict(mix["templates"][table])
+                value[schema.get_key_fields(table)[-1]] = str(uuid.uuid4())
+            else:
+                value = keys[table][mix["choosers"][table].choose(len(keys[table]))]
+            pending[executor.submit(run_mixed_operation, phase, kind, table, value, keys[table], int(intended_ns))] = phase
+            scheduled[phase] += 1
+            if len(pending) >= 1000:
+                collect([future for future in pending if future.done()])
+            if config.MIXED_ARRIVAL == "poisson":
+                intended_ns += random.expovariate(1.0) * interval_ns
+            else:
+                intended_ns += interval_ns
+    done, _ = wait(pending)
+    collect(done)
+    print(f"Open loop at {rate:.0f} ops/sec completed ({sum(scheduled.values())} requests, scheduler lagged at most {max_lag_ns / 1e6:.1f} ms)")
+    return scheduled, completed
+
+def run_mixed_workload(handle):
+    mix = prepare_mixed_workload(handle)
+    if mix is None:
+        print("Mixed workload skipped, no rows found")
+        return
+    windows = [("Mixed Workload (warm-up)", config.MIXED_WARMUP_SECONDS), ("Mixed Workload (steady state)", config.MIXED_DURATION_SECONDS)]
+    scheduled, _ = run_open_loop(mix, config.MIXED_TARGET_OPS_PER_SEC, windows)
+
+    for phase, duration in windows:
+        metrics.timings.append((phase, duration))
+        metrics.report_latencies(phase)
+        merged = metrics.merge_latencies(phase)
+        service = metrics.merge_latencies(phase, service=True)
+        achieved = merged.ops_per_sec()
+        metrics.mixed_stats.append((phase, config.MIXED_KEY_DISTRIBUTION, config.MIXED_ARRIVAL, config.MIXED_TARGET_OPS_PER_SEC, scheduled[phase], achieved,
+                            merged.percentile(50) / 1e6, merged.percentile(99) / 1e6, merged.percentile(99.9) / 1e6, merged.max / 1e6, service.percentile(99) / 1e6))
+        print(f"{phase}: {merged.count} requests, {achieved:.1f} ops/sec of {config.MIXED_TARGET_OPS_PER_SEC} targeted, p50 {merged.percentile(50) / 1e6:.3f} ms, "
+              f"p99 {merged.percentile(99) / 1e6:.3f} ms including queueing, service p99 {service.percentile(99) / 1e6:.3f} ms")
+
+def find_max_throughput(handle):
+    # Ramps the offered load up additively while the store keeps up within
+    # the p99 SLO and cuts it multiplicatively when it does not; the knee is
+    # the highest throughput achieved by a window that met the SLO
+    mix = prepare_mixed_workload(handle)
+    if mix is None:
+        print("Max throughput search skipped, no rows found")
+        return
+    rate = config.AIMD_START_OPS_PER_SEC
+    decreases = 0
+    knee = None
+    for window in range(1, config.AIMD_MAX_WINDOWS + 1):
+        phase = f"Max Throughput (window {window}, {rate:.0f} ops/sec)"
+        before = rate_control.rate_controller.snapshot()
+        scheduled, completed = run_open_loop(mix, rate, [(phase, config.AIMD_WINDOW_SECONDS)])
+        after = rate_control.rate_controller.snapshot()
+        throttles = sum(counters["throttles"] - before.get(table, {}).get("throttles", 0) for table, counters in after.items())
+        retries = sum(counters["retries"] - before.get(table, {}).get("retries", 0) for table, counters in after.items())
+        merged = metrics.merge_latencies(phase)
+        service = metrics.merge_latencies(phase, service=True)
+        # Only requests that completed within the window count, the ones still
+        # queued in the client pool or at the store when it ended do not
+        achieved = completed[phase] / config.AIMD_WINDOW_SECONDS
+        p99 = merged.percentile(99) / 1e6
+        # The store keeps up when the latency from the intended arrival meets
+        # the SLO, so that queueing in the client counts, and nearly all of
+        # the requests scheduled in the window completed before it ended.
+        # Comparing to the scheduled requests rather than the rate keeps the
+        # Poisson noise of the arrivals out of the decision
+        sustained = p99 <= config.SLO_P99_MS and completed[phase] >= config.AIMD_MIN_ACHIEVED * scheduled[phase]
+        metrics.max_throughput_stats.append([window, rate, achieved, service.percentile(50) / 1e6, service.percentile(99) / 1e6, p99, throttles, retries, sustained, False])
+        print(f"{phase}: {achieved:.1f} ops/sec achieved ({completed[phase]} of {scheduled[phase]} requests completed in the window), p99 {p99:.3f} ms including queueing, "
+              f"service p99 {service.percentile(99) / 1e6:.3f} ms, {throttles} throttles, {retries} retries, {'sustained' if sustained else 'not sustained'}")
+        if sustained:
+            if knee is None or achieved > knee[1]:
+                knee = (rate, achieved, p99, metrics.max_throughput_stats[-1])
+            rate += config.AIMD_INCREASE_OPS_PER_SEC
+        else:
+            decreases += 1
+            if decreases >= config.AIMD_MAX_DECREASES:
+                break
+            rate = max(rate * config.AIMD_DECREASE_FACTOR, 1)
+    if knee is None:
+        print(f"No offered load met the p99 SLO of {config.SLO_P99_MS} ms")
+    else:
+        knee[3][-1] = True
+        print(f"Max sustainable throughput: {knee[1]:.1f} ops/sec at {knee[0]:.0f} ops/sec offered, p99 {knee[2]:.3f} ms (SLO {config.SLO_P99_MS} ms)")
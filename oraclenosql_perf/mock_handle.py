@@ -0,0 +1,363 @@
+from borneo import (
+    IllegalArgumentException, PreparedStatement, ReadThrottlingException,
+    TableNotFoundException, WriteThrottlingException)
+from itertools import count
+import math
+import random
+import re
+import threading
+import time
+
+# In-process stand-in for NoSQLHandle that keeps the tables in memory. It
+# understands the statements issued by the benchmark scripts: CREATE/DROP
+# TABLE, CREATE INDEX (a no-op), SELECT with optional column list, equality
+# WHERE conditions and LIMIT, UPDATE ... SET t.f = t.f || '...' (f may be a
+# path into a JSON column), DELETE FROM
+# and a simplified NESTED TABLES query that returns the root and descendant
+# rows of one key instead of joined paths. Table limits set with a TableRequest
+# are enforced per second on the key-based requests; queries are not charged.
+
+# Tables are shared by every handle of the process, so worker handles see the
+# rows written by the main handle
+tables = {}
+tables_lock = threading.RLock()
+# Remaining rows of paged queries keyed by the continuation key, shared like
+# the tables since the next page may be requested from another handle
+cursors = {}
+cursor_ids = count(1)
+
+class MockTable:
+    def __init__(self, name, key_fields, shard_size):
+        self.name = name
+        self.key_fields = key_fields
+        self.shard_size = shard_size
+        self.rows = {}
+        # (read units, write units) per second, shared with the child tables
+        self.limits = None
+        self.second = None
+        self.used_units = [0, 0]
+
+    def key_of(self, row):
+        try:
+            return tuple(row[field] for field in self.key_fields)
+        except KeyError as e:
+            raise IllegalArgumentException(f"Primary key field {e} missing for table {self.name}")
+
+    def matches(self, row, key):
+        return all(row.get(field) == value for field, value in key.items())
+
+    def charge(self, read_units, write_units):
+        # Refuses the request when the units of the current second are used up
+        if self.limits is None:
+            return
+        second = int(time.monotonic())
+        if second != self.second:
+            self.second = second
+            self.used_units = [0, 0]
+        if read_units and self.used_units[0] + read_units > self.limits[0]:
+            raise ReadThrottlingException(f"Read limit of table {self.name} exceeded")
+        if write_units and self.used_units[1] + write_units > self.limits[1]:
+            raise WriteThrottlingException(f"Write limit of table {self.name} exceeded")
+        self.used_units[0] += read_units
+        self.used_units[1] += write_units
+
+class MockResult:
+    def __init__(self, value=None, write_kb=0, read_kb=0, success=True, failed_index=-1, deletions=0, results=None):
+        self.value = value
+        self.write_kb = write_kb
+        self.read_kb = read_kb
+        self.success = success
+        self.failed_index = failed_index
+        self.deletions = deletions
+        self.results = results if results is not None else []
+
+    def get_value(self):
+        return self.value
+
+    def get_write_kb(self):
+        return self.write_kb
+
+    def get_read_kb(self):
+        return self.read_kb
+
+    def get_success(self):
+        return self.success
+
+    def get_failed_operation_index(self):
+        return self.failed_index
+
+    def get_num_deletions(self):
+        return self.deletions
+
+    def get_continuation_key(self):
+        return None
+
+    def get_results(self):
+        return self.results
+
+class MockPreparedStatement(PreparedStatement):
+    # Only keeps the statement text and the bound variables
+    def __init__(self, sql_text):
+        self.sql_text = sql_text
+        self.variables = {}
+
+    def set_variable(self, variable, value):
+        self.variables[variable] = value
+        return self
+
+    def get_variables(self):
+        return self.variables
+
+    def get_sql_text(self):
+        return self.sql_text
+
+    def clear_variables(self):
+        self.variables.clear()
+
+class MockPrepareResult:
+    def __init__(self, prepared_statement):
+        self.prepared_statement = prepared_statement
+
+    def get_prepared_statement(self):
+        return self.prepared_statement
+
+def row_kb(row):
+    return max(1, math.ceil(len(repr(row).encode()) / 1024))
+
+def parse_conditions(text, variables):
+    # "t.a = $a AND b = $b" -> {"a": value of $a, "b": value of $b}
+    key = {}
+    if not text:
+        return key
+    for condition in re.split(r'\s+AND\s+', text.strip(), flags=re.IGNORECASE):
+        match = re.fullmatch(r"(?:\w+\.)?(\w+)\s*=\s*(\$\w+|'[^']*')", condition.strip())
+        if match is None:
+            raise IllegalArgumentException(f"Unsupported condition in mock backend: {condition}")
+        value = match.group(2)
+        if value.startswith("$"):
+            if value not in variables:
+                raise IllegalArgumentException(f"Variable {value} is not bound")
+            key[match.group(1)] = variables[value]
+        else:
+            key[match.group(1)] = value[1:-1]
+    return key
+
+class MockNoSQLHandle:
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, throttle_rate=0.0, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.throttle_rate = throttle_rate
+        self.random = random.Random(seed)
+
+    def inject(self, write):
+        # Simulated network round trip, and an occasional throttling error
+        # raised before the operation is applied
+        delay = self.latency_ms + self.random.uniform(-self.jitter_ms, self.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000)
+        if self.throttle_rate and self.random.random() < self.throttle_rate:
+            if write:
+                raise WriteThrottlingException("Mock backend write throttled")
+            raise ReadThrottlingException("Mock backend read throttled")
+
+    @staticmethod
+    def get_table(name):
+        table = tables.get(name)
+        if table is None:
+            raise TableNotFoundException(f"Table {name} does not exist")
+        return table
+
+    @staticmethod
+    def get_limited_table(name):
+        # Child tables are limited by their top-level table
+        return MockNoSQLHandle.get_table(name.split(".")[0])
+
+    def do_table_request(self, request, timeout_ms=None, poll_interval_ms=None):
+        self.inject(True)
+        if request.get_statement() is None:
+            limits = request.get_table_limits()
+            with tables_lock:
+                self.get_table(request.get_table_name()).limits = (limits.get_read_units(), limits.get_write_units())
+            return MockResult()
+        statement = " ".join(request.get_statement().split())
+        with tables_lock:
+            match = re.match(r'CREATE TABLE (IF NOT EXISTS )?([\w.]+) \((.*)\)$', statement, re.IGNORECASE)
+            if match is not None:
+                self.create_table(match.group(2), match.group(3), match.group(1) is not None)
+                return MockResult()
+            match = re.match(r'DROP TABLE (IF EXISTS )?([\w.]+)$', statement, re.IGNORECASE)
+            if match is not None:
+                name = match.group(2)
+                if name not in tables:
+                    if match.group(1) is None:
+                        raise TableNotFoundException(f"Table {name} does not exist")
+                elif any(other.startswith(name + ".") for other in tables):
+                    raise IllegalArgumentException(f"Table {name} has child tables")
+                tables.pop(name, None)
+                return MockResult()
+            if re.match(r'CREATE INDEX ', statement, re.IGNORECASE):
+                return MockResult()
+        raise IllegalArgumentException(f"Unsupported table statement in mock backend: {statement}")
+
+    def create_table(self, name, definition, if_not_exists):
+        if name in tables:
+            if if_not_exists:
+                return
+            raise IllegalArgumentException(f"Table {name} already exists")
+        match = re.search(r'PRIMARY KEY\s*\((.*)\)', definition, re.IGNORECASE)
+        if match is None:
+            raise IllegalArgumentException(f"Table {name} has no primary key")
+        shard_match = re.search(r'SHARD\s*\(([^)]*)\)', match.group(1), re.IGNORECASE)
+        key_text = re.sub(r'SHARD\s*\(([^)]*)\)', r'\1', match.group(1), flags=re.IGNORECASE)
+        key_fields = [field.strip() for field in key_text.split(",")]
+        shard_size = len(shard_match.group(1).split(",")) if shard_match is not None else 1
+        parent_name = name.rpartition(".")[0]
+        if parent_name:
+            # Child tables inherit the primary key and shard key of the parent
+            parent = self.get_table(parent_name)
+            key_fields = parent.key_fields + key_fields
+            shard_size = parent.shard_size
+        tables[name] = MockTable(name, key_fields, shard_size)
+
+    def put(self, request):
+        self.inject(True)
+        row = dict(request.get_value())
+        with tables_lock:
+            table = self.get_table(request.get_table_name())
+            key = table.key_of(row)
+            self.get_limited_table(table.name).charge(0, row_kb(row))
+            table.rows[key] = row
+        return MockResult(write_kb=row_kb(row))
+
+    def get(self, request):
+        self.inject(False)
+        with tables_lock:
+            table = self.get_table(request.get_table_name())
+            row = table.rows.get(table.key_of(request.get_key()))
+            self.get_limited_table(table.name).charge(row_kb(row) if row is not None else 1, 0)
+        return MockResult(value=dict(row) if row is not None else None, read_kb=row_kb(row) if row is not None else 1)
+
+    def delete(self, request):
+        self.inject(True)
+        with tables_lock:
+            table = self.get_table(request.get_table_name())
+            key = table.key_of(request.get_key())
+            self.get_limited_table(table.name).charge(0, row_kb(table.rows[key]) if key in table.rows else 0)
+            row = table.rows.pop(key, None)
+        return MockResult(success=row is not None, write_kb=row_kb(row) if row is not None else 0)
+
+    def multi_delete(self, request):
+        self.inject(True)
+        key = request.get_key()
+        with tables_lock:
+            table = self.get_table(request.get_table_name())
+            keys = [row_key for row_key, row in table.rows.items() if table.matches(row, key)]
+            self.get_limited_table(table.name).charge(0, sum(row_kb(table.rows[row_key]) for row_key in keys))
+            for row_key in keys:
+                del table.rows[row_key]
+        return MockResult(deletions=len(keys))
+
+    def write_multiple(self, request):
+        self.inject(True)
+        rows = []
+        with tables_lock:
+            for operation in request.get_operations():
+                put_request = operation.get_request()
+                table = self.get_table(put_request.get_table_name())
+                row = dict(put_request.get_value())
+                rows.append((table, table.key_of(row), row))
+            # All operations of a batch must share one shard key
+            shard_keys = {key[:table.shard_size] for table, key, _ in rows}
+            if len(shard_keys) > 1:
+                raise IllegalArgumentException("All operations of a WriteMultipleRequest must share the same shard key")
+            if rows:
+                self.get_limited_table(rows[0][0].name).charge(0, sum(row_kb(row) for _, _, row in rows))
+            for table, key, row in rows:
+                table.rows[key] = row
+        return MockResult(write_kb=sum(row_kb(row) for _, _, row in rows))
+
+    def prepare(self, request):
+        self.inject(False)
+        return MockPrepareResult(MockPreparedStatement(request.get_statement()))
+
+    def query(self, request):
+        self.inject(False)
+        cont_key = request.get_cont_key()
+        if cont_key is not None:
+            with tables_lock:
+                results = cursors.pop(cont_key, None)
+            if results is None:
+                raise IllegalArgumentException("Unknown continuation key in mock backend")
+        else:
+            prepared_statement = request.get_prepared_statement()
+            if prepared_statement is not None:
+                results = self.execute(prepared_statement.get_sql_text(), prepared_statement.get_variables())
+            else:
+                results = self.execute(request.get_statement(), {})
+        limit = request.get_limit() or len(results)
+        batch, rest = results[:limit], results[limit:]
+        if rest:
+            with tables_lock:
+                cont_key = f"mock-{next(cursor_ids)}".encode()
+                cursors[cont_key] = rest
+            request.set_cont_key(cont_key)
+        else:
+            request.set_cont_key(None)
+        return MockResult(results=batch)
+
+    def execute(self, statement, variables):
+        statement = " ".join(statement.split())
+        statement = re.sub(r'^DECLARE [^;]*;\s*', '', statement, flags=re.IGNORECASE)
+        with tables_lock:
+            match = re.fullmatch(r'SELECT \* FROM NESTED TABLES\(([\w.]+) (\w+) DESCENDANTS\((.*)\)\)(?: WHERE (.*))?', statement, re.IGNORECASE)
+            if match is not None:
+                key = parse_conditions(match.group(4), variables)
+                results = [{match.group(2): dict(row)} for row in self.get_table(match.group(1)).rows.values() if self.get_table(match.group(1)).matches(row, key)]
+                for descendant in match.group(3).split(","):
+                    name, alias = descendant.split()
+                    table = self.get_table(name)
+                    results.extend({alias: dict(row)} for row in table.rows.values() if table.matches(row, key))
+                return results
+            match = re.fullmatch(r'SELECT (.+?) FROM ([\w.]+)(?: \w+)?(?: WHERE (.*?))?(?: LIMIT (\d+))?', statement, re.IGNORECASE)
+            if match is not None:
+                table = self.get_table(match.group(2))
+                key = parse_conditions(match.group(3), variables)
+                rows = [row for row in table.rows.values() if table.matches(row, key)]
+                if match.group(4) is not None:
+                    rows = rows[:int(match.group(4))]
+                if match.group(1).strip() == "*":
+                    return [dict(row) for row in rows]
+                columns = [column.strip() for column in match.group(1).split(",")]
+                return [{column: row.get(column) for column in columns} for row in rows]
+            match = re.fullmatch(r"UPDATE ([\w.]+) (\w+) SET \2\.([\w.]+) = \2\.\3 \|\| '([^']*)'(?: WHERE (.*))?", statement, re.IGNORECASE)
+            if match is not None:
+                table = self.get_table(match.group(1))
+                key = parse_conditions(match.group(5), variables)
+                # The field may be a path into a JSON column, e.g. doc.title
+                *path, field = match.group(3).split(".")
+                updated = 0
+                for row in table.rows.values():
+                    if table.matches(row, key):
+                        document = row
+                        for name in path:
+                            document = document[name]
+                        document[field] = document[field] + match.group(4)
+                        updated += 1
+                return [{"NumRowsUpdated": updated}]
+            match = re.fullmatch(r'DELETE FROM ([\w.]+)(?: \w+)?(?: WHERE (.*))?', statement, re.IGNORECASE)
+            if match is not None:
+                table = self.get_table(match.group(1))
+                key = parse_conditions(match.group(2), variables)
+                keys = [row_key for row_key, row in table.rows.items() if table.matches(row, key)]
+                for row_key in keys:
+                    del table.rows[row_key]
+                return [{"numRowsDeleted": len(keys)}]
+        raise IllegalArgumentException(f"Unsupported query in mock backend: {statement}")
+
+    def close(self):
+        pass
+
+def reset():
+    with tables_lock:
+        tables.clear()
+        cursors.clear()
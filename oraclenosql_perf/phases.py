@@ -0,0 +1,230 @@
+from . import async_runner, comparisons, config, generation, metrics, mixed, rate_control, reads, workload
+
+# Phases are the named steps a run is composed of. Each one wraps a workload
+# function and is looked up by name in PHASES, so a run is a list of names:
+# the full benchmark, the quick benchmark of main.py or any selection passed
+# to the headless runner.
+
+PHASES = {}
+
+class RunContext:
+    # What the phases of one run share: the handle, the pre-generated dataset
+    # (None streams freshly generated rows) and the ids and students the
+    # insert phases hand on to the next ones. With load_dataset the dataset is
+    # loaded before the first phase that replays it, so runs of other phases
+    # never generate it
+    def __init__(self, handle, dataset=None, load_dataset=False):
+        self.handle = handle
+        self.dataset = dataset
+        self.load_dataset = load_dataset
+        self.instructors = None
+        self.students = None
+        self.course_ids = None
+
+    def prepare_dataset(self):
+        if self.load_dataset and self.dataset is None:
+            self.dataset = generation.load_dataset()
+        self.load_dataset = False
+
+class Phase:
+    # A timed phase runs inside measure_time and is reported under its title,
+    # the others time and report their own sub-phases. A phase that replays
+    # the dataset gets it loaded before it is timed
+    def __init__(self, name, title, func, timed=True, uses_dataset=False):
+        self.name = name
+        self.title = title
+        self.func = func
+        self.timed = timed
+        self.uses_dataset = uses_dataset
+
+    def run(self, context):
+        if self.uses_dataset:
+            context.prepare_dataset()
+        if self.timed:
+            metrics.measure_time(self.title, lambda: self.func(context))
+        else:
+            self.func(context)
+
+def phase(name, title=None, timed=True, uses_dataset=False):
+    def register(func):
+        PHASES[name] = Phase(name, title, func, timed, uses_dataset)
+        return func
+    return register
+
+def run_phases(context, names):
+    unknown = [name for name in names if name not in PHASES]
+    if unknown:
+        raise ValueError(f"Unknown phase(s) {', '.join(unknown)}, available: {', '.join(PHASES)}")
+    for name in names:
+        PHASES[name].run(context)
+
+def get_instructors(context):
+    # Phases run on their own find the ids in the store
+    if context.instructors is None:
+        context.instructors = generation.IdIndex(row["id"] for row in workload.scan_table(context.handle, "Users") if row["role"] == "instructor")
+    return context.instructors
+
+def get_students(context):
+    if context.students is None:
+        context.students = generation.StudentIndex()
+        for user in workload.retrieve_users(context.handle):
+            if user["role"] == "student":
+                context.students.append(user)
+    return context.students
+
+def get_course_ids(context):
+    if context.course_ids is None:
+        context.course_ids = generation.IdIndex(row["id"] for row in workload.scan_table(context.handle, "Courses"))
+    return context.course_ids
+
+def count_rows(context, table):
+    rows = sum(1 for _ in workload.scan_table(context.handle, table))
+    print(f"{rows} rows of {table} retrieved successfully")
+
+@phase("drop_tables", "Drop Tables")
+def drop_tables(context):
+    workload.drop_tables(context.handle)
+
+@phase("create_tables", "Create Tables")
+def create_tables(context):
+    workload.create_tables(context.handle)
+
+@phase("benchmark_generators", timed=False)
+def benchmark_generators(context):
+    generation.benchmark_generators()
+
+@phase("insert_users", "Insert Users", uses_dataset=True)
+def insert_users(context):
+    context.instructors, context.students = workload.insert_users(context.handle, context.dataset)
+
+@phase("retrieve_users", "Retrieve Users")
+def retrieve_users(context):
+    count_rows(context, "Users")
+
+@phase("insert_courses", "Insert Courses, Lessons, Quizzes, and Questions", uses_dataset=True)
+def insert_courses(context):
+    context.course_ids = workload.insert_courses(context.handle, get_instructors(context), context.dataset)
+
+@phase("retrieve_courses", "Retrieve Courses")
+def retrieve_courses(context):
+    count_rows(context, "Courses")
+
+@phase("insert_enrollments", "Insert Enrollments", uses_dataset=True)
+def insert_enrollments(context):
+    if context.dataset is not None:
+        workload.insert_enrollments(context.handle, None, None, context.dataset)
+    else:
+        workload.insert_enrollments(context.handle, get_students(context), get_course_ids(context))
+
+@phase("bulk_insert_users", "Bulk Insert Users")
+def bulk_insert_users(context):
+    # Always freshly generated users, the dataset ones are already stored
+    workload.insert_users(context.handle)
+
+@phase("bulk_edit_users", "Bulk Edit Users")
+def bulk_edit_users(context):
+    workload.rename_users(context.handle)
+
+@phase("worker_processes", timed=False, uses_dataset=True)
+def worker_processes(context):
+    workload.run_worker_processes(context.dataset if context.dataset is not None else generation.generate_dataset())
+
+@phase("insert_all_data", "Insert All Data", uses_dataset=True)
+def insert_all_data(context):
+    workload.insert_all_data(context.handle, context.dataset)
+
+@phase("retrieve_all_data", "Retrieve All Data")
+def retrieve_all_data(context):
+    workload.retrieve_all_data(context.handle)
+
+@phase("read_workload", timed=False)
+def read_workload(context):
+    reads.read_workload(context.handle)
+
+@phase("cache_benchmark", timed=False)
+def cache_benchmark(context):
+    reads.cache_benchmark(context.handle)
+
+@phase("mixed_workload", timed=False)
+def mixed_workload(context):
+    mixed.run_mixed_workload(context.handle)
+
+@phase("max_throughput", timed=False)
+def max_throughput(context):
+    mixed.find_max_throughput(context.handle)
+
+@phase("update_all_data", "Update All Data")
+def update_all_data(context):
+    workload.UPDATE_FUNCTIONS[config.UPDATE_STRATEGY](context.handle)
+
+@phase("delete_all_data", "Delete All Data")
+def delete_all_data(context):
+    workload.DELETE_FUNCTIONS[config.DELETE_STRATEGY](context.handle)
+
+@phase("compare_write_modes", "Compare Write Modes", uses_dataset=True)
+def compare_write_modes(context):
+    comparisons.compare_write_modes(context.handle, context.dataset)
+
+@phase("compare_update_delete_strategies", timed=False, uses_dataset=True)
+def compare_update_delete_strategies(context):
+    comparisons.compare_update_delete_strategies(context.handle, context.dataset)
+
+@phase("async_sweep", timed=False, uses_dataset=True)
+def async_sweep(context):
+    async_runner.run_async_sweep(context.handle, context.dataset)
+
+@phase("compare_schema_layouts", timed=False, uses_dataset=True)
+def compare_schema_layouts(context):
+    comparisons.compare_schema_layouts(context.handle, context.dataset)
+
+@phase("payload_sweep", timed=False, uses_dataset=True)
+def payload_sweep(context):
+    comparisons.payload_sweep(context.handle, context.dataset)
+
+@phase("report_retries", timed=False)
+def report_retries(context):
+    rate_control.report_retries()
+
+# The quick benchmark of main.py
+QUICK_PHASES = ["drop_tables", "create_tables", "insert_users", "retrieve_users", "insert_courses", "retrieve_courses",
+                "bulk_insert_users", "bulk_edit_users"]
+
+def benchmark_phases():
+    # The full benchmark as the workload settings configure it
+    names = ["drop_tables", "create_tables"]
+    if config.NUM_PROCESSES > 1:
+        names.append("worker_processes")
+    else:
+        names += ["insert_all_data", "retrieve_all_data"]
+        if config.RUN_READ_WORKLOAD:
+            names.append("read_workload")
+        if config.RUN_CACHE_BENCHMARK:
+            names.append("cache_benchmark")
+        if config.RUN_MIXED_WORKLOAD:
+            names.append("mixed_workload")
+        if config.FIND_MAX_THROUGHPUT:
+            names.append("max_throughput")
+        names += ["update_all_data", "delete_all_data"]
+    if config.COMPARE_WRITE_MODES:
+        names.append("compare_write_modes")
+    if config.COMPARE_UPDATE_STRATEGIES or config.COMPARE_DELETE_STRATEGIES:
+        names.append("compare_update_delete_strategies")
+    if config.ASYNC_CONCURRENCY_DEPTHS:
+        names.append("async_sweep")
+    if config.COMPARE_SCHEMA_LAYOUTS:
+        names.append("compare_schema_layouts")
+    if config.PAYLOAD_SIZES:
+        names.append("payload_sweep")
+    names.append("report_retries")
+    return names
+
+@phase("benchmark", timed=False)
+def benchmark(context):
+    run_phases(context, benchmark_phases())
+
+@phase("quick", timed=False)
+def quick(context):
+    run_phases(context, QUICK_PHASES)
+
+def run_benchmark(handle, dataset):
+    run_phases(RunContext(handle, dataset), benchmark_phases())
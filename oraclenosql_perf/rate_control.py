@@ -0,0 +1,155 @@
+from borneo import RetryableException, ThrottlingException
+from . import config, metrics
+import threading
+import time
+import random
+
+# Retries with backoff, AIMD pacing of throttled tables and the timed calls
+# every request of the benchmark goes through.
+
+class RateController:
+    # Retry counters and AIMD pacing per table. A table is not paced until it
+    # is first throttled, the rate then starts from the successes of the last
+    # second
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.tables = {}
+
+    def reset(self):
+        with self.lock:
+            self.tables.clear()
+
+    def get_state(self, table):
+        state = self.tables.get(table)
+        if state is None:
+            state = self.tables[table] = {"successes": 0, "retries": 0, "throttles": 0, "failures": 0, "waits": 0, "wait_ns": 0, "rate": None, "min_rate": None,
+                                          "next_ns": 0, "decreased_ns": 0, "second": 0, "second_successes": 0, "last_second_successes": 0}
+        return state
+
+    def acquire(self, table):
+        # Reserves the next send slot of the table and waits for it, returns
+        # whether it had to wait
+        with self.lock:
+            state = self.get_state(table)
+            if state["rate"] is None:
+                return False
+            now_ns = time.perf_counter_ns()
+            slot_ns = max(state["next_ns"], now_ns)
+            state["next_ns"] = slot_ns + int(1e9 / state["rate"])
+        if slot_ns > now_ns:
+            time.sleep((slot_ns - now_ns) / 1e9)
+            return True
+        return False
+
+    def record_success(self, table, wait_ns):
+        # wait_ns is the time the request spent paced, backing off and in
+        # failed attempts before the attempt that succeeded
+        with self.lock:
+            state = self.get_state(table)
+            state["successes"] += 1
+            if wait_ns:
+                state["waits"] += 1
+                state["wait_ns"] += wait_ns
+            second = time.perf_counter_ns() // 1_000_000_000
+            if second != state["second"]:
+                state["last_second_successes"] = state["second_successes"] if second == state["second"] + 1 else 0
+                state["second"] = second
+                state["second_successes"] = 0
+            state["second_successes"] += 1
+            if config.RATE_CONTROL and state["rate"] is not None:
+                state["rate"] += config.RATE_CONTROL_INCREASE_OPS / state["rate"]
+
+    def record_error(self, table, throttled, retrying):
+        with self.lock:
+            state = self.get_state(table)
+            state["retries" if retrying else "failures"] += 1
+            if not throttled:
+                return
+            state["throttles"] += 1
+            now_ns = time.perf_counter_ns()
+            if not config.RATE_CONTROL or now_ns - state["decreased_ns"] < config.RATE_CONTROL_DECREASE_INTERVAL_MS * 1e6:
+                return
+            rate = state["rate"] if state["rate"] is not None else max(state["last_second_successes"], state["second_successes"])
+            state["rate"] = max(rate * config.RATE_CONTROL_DECREASE_FACTOR, config.RATE_CONTROL_MIN_OPS)
+            state["min_rate"] = min(state["rate"], state["min_rate"]) if state["min_rate"] is not None else state["rate"]
+            state["decreased_ns"] = now_ns
+            state["next_ns"] = max(state["next_ns"], now_ns + int(1e9 / state["rate"]))
+
+    def snapshot(self):
+        with self.lock:
+            return {table: {name: state[name] for name in ["successes", "retries", "throttles", "failures", "waits", "wait_ns", "rate", "min_rate"]}
+                    for table, state in self.tables.items()}
+
+    def merge(self, snapshot):
+        # Adds the counters of a worker process
+        with self.lock:
+            for table, counters in snapshot.items():
+                state = self.get_state(table)
+                for name in ["successes", "retries", "throttles", "failures", "waits", "wait_ns"]:
+                    state[name] += counters[name]
+                if counters["min_rate"] is not None:
+                    state["min_rate"] = min(counters["min_rate"], state["min_rate"]) if state["min_rate"] is not None else counters["min_rate"]
+
+rate_controller = RateController()
+
+def attempt_with_retry(table, call, request):
+    # Retries throttling and other retryable errors with exponential backoff
+    # and full jitter, anything else or running out of retries is raised.
+    # Returns the result, the start of the first attempt, the start and end of
+    # the attempt that succeeded and its thread CPU time when
+    # SPLIT_REQUEST_TIME is on
+    attempt = 0
+    waited = False
+    first_ns = time.perf_counter_ns()
+    while True:
+        if config.RATE_CONTROL and rate_controller.acquire(table):
+            waited = True
+        cpu_start_ns = time.thread_time_ns() if config.SPLIT_REQUEST_TIME else 0
+        start_ns = time.perf_counter_ns()
+        try:
+            result = call(request)
+        except RetryableException as e:
+            retrying = attempt < config.MAX_RETRIES
+            rate_controller.record_error(table, isinstance(e, ThrottlingException), retrying)
+            if not retrying:
+                raise
+            attempt += 1
+            time.sleep(random.uniform(0, min(config.RETRY_MAX_DELAY_MS, config.RETRY_BASE_DELAY_MS * 2 ** attempt)) / 1000)
+            continue
+        end_ns = time.perf_counter_ns()
+        cpu_ns = time.thread_time_ns() - cpu_start_ns if config.SPLIT_REQUEST_TIME else 0
+        rate_controller.record_success(table, start_ns - first_ns if waited or attempt else 0)
+        return result, first_ns, start_ns, end_ns, cpu_ns
+
+def call_with_retry(table, call, request):
+    return attempt_with_retry(table, call, request)[0]
+
+def report_retries():
+    counters = rate_controller.snapshot()
+    if not counters:
+        return
+    print("Retries:")
+    print(f"  {'table':<12} {'requests':>9} {'retries':>8} {'throttles':>9} {'failures':>8} {'waited':>8} {'wait (s)':>9} {'rate':>10} {'min rate':>10}")
+    for table, table_counters in counters.items():
+        rate = table_counters["rate"]
+        min_rate = table_counters["min_rate"]
+        wait_seconds = table_counters["wait_ns"] / 1e9
+        metrics.retry_stats.append((table, table_counters["successes"], table_counters["retries"], table_counters["throttles"], table_counters["failures"],
+                            table_counters["waits"], wait_seconds, rate, min_rate))
+        rate_text = f"{rate:.1f}" if rate is not None else "unpaced"
+        min_rate_text = f"{min_rate:.1f}" if min_rate is not None else "-"
+        print(f"  {table or '-':<12} {table_counters['successes']:>9} {table_counters['retries']:>8} {table_counters['throttles']:>9} "
+              f"{table_counters['failures']:>8} {table_counters['waits']:>8} {wait_seconds:>9.3f} {rate_text:>10} {min_rate_text:>10}")
+
+def timed_call(operation, table, call, request):
+    # Latency covers the whole request, pacing, backoff and failed attempts
+    # included, the same as when the driver retries inside the call; the
+    # attempt that succeeded is recorded as its service time
+    result, first_ns, start_ns, end_ns, cpu_ns = attempt_with_retry(table, call, request)
+    if config.SPLIT_REQUEST_TIME:
+        # CPU time of this thread inside the call is spent by the driver on
+        # the client, the rest of the wall time is waiting for the store
+        metrics.record_request_time(operation, table, end_ns - start_ns, cpu_ns)
+    metrics.record_latency(operation, table, first_ns, end_ns)
+    metrics.record_latency(operation, table, start_ns, end_ns, service=True)
+    return result
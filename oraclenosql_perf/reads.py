@@ -0,0 +1,379 @@
+from borneo import (
+    Consistency, DeleteRequest, GetRequest, PrepareRequest, PutRequest,
+    QueryRequest, TableRequest)
+from . import config, metrics, rate_control, schema, workload
+from collections import OrderedDict
+from itertools import accumulate
+import re
+import threading
+import uuid
+import time
+import random
+
+# Read workloads: secondary index cost, point reads with child lookups, the
+# read-through cache and course tree reads.
+
+def get_indexes():
+    # In the hierarchy schema the descendants of a course are found by their
+    # primary key prefix, so only the enrollment indexes are needed
+    if config.SCHEMA_MODE == "hierarchy":
+        return [index for index in config.INDEXES if index[1] not in config.CHILD_TABLES]
+    return config.INDEXES
+
+def create_indexes(handle):
+    for index, table, field in get_indexes():
+        statement = f'CREATE INDEX IF NOT EXISTS {index} ON {table}({field})'
+        start_time = time.perf_counter()
+        workload.do_table_request(handle, TableRequest().set_statement(statement))
+        duration = time.perf_counter() - start_time
+        metrics.index_stats.append((index, "create (seconds)", config.NUM_USERS, config.NUM_COURSES, duration))
+        print(f"Index {index} created in {duration:.2f} seconds")
+    print("Indexes created successfully")
+
+def insert_index_sample(handle, label, copies):
+    # Writes copies of existing child rows under new ids, and reports the
+    # write KB per row which grows with every index on the table. The keys of
+    # the copies are added to copies so they can be deleted after the pass
+    for table in dict.fromkeys(table for _, table, _ in get_indexes()):
+        # The sample is read before writing so the query never sees a copy
+        sample = [dict(result) for result in workload.query_rows(handle, f'SELECT * FROM {schema.get_table_name(table)} LIMIT {config.INDEX_SAMPLE_ROWS}', table)]
+        write_kb = 0
+        for record in sample:
+            record[schema.get_key_fields(table)[-1]] = str(uuid.uuid4())
+            put_request = PutRequest().set_table_name(schema.get_table_name(table)).set_value(record)
+            put_result = rate_control.timed_call("put", table, handle.put, put_request)
+            write_kb += put_result.get_write_kb()
+            copies.append((table, schema.get_primary_key(table, record)))
+        if sample:
+            metrics.index_stats.append((table, f"write KB per row ({label})", config.NUM_USERS, config.NUM_COURSES, write_kb / len(sample)))
+            print(f"{table} {label}: {write_kb / len(sample):.2f} write KB per row")
+
+def delete_index_sample(handle, copies):
+    # The copies share their parent ids with the dataset rows, left in place
+    # they would show up in the lookups and the update and delete phases
+    for table, key in copies:
+        rate_control.call_with_retry(table, handle.delete, DeleteRequest().set_table_name(schema.get_table_name(table)).set_key(key))
+    print(f"{len(copies)} sample rows deleted successfully")
+    copies.clear()
+
+def lookup_course(handle, course_id, consistency, statements):
+    start_ns = time.perf_counter_ns()
+    get_request = GetRequest().set_table_name("Courses").set_key({"id": course_id}).set_consistency(consistency)
+    rate_control.timed_call("get", "Courses", handle.get, get_request)
+    if config.SCHEMA_MODE == "hierarchy":
+        # The whole subtree comes back from the course's shard in one query
+        statements["Courses"].set_variable("$id", course_id)
+        tree_request = QueryRequest().set_prepared_statement(statements["Courses"]).set_consistency(consistency)
+        workload.execute_statement(handle, tree_request, "nested_query", "Courses")
+        metrics.record_latency("load_course", "Courses", start_ns, time.perf_counter_ns())
+        return
+    statements["Lessons"].set_variable("$courseId", course_id)
+    lesson_request = QueryRequest().set_prepared_statement(statements["Lessons"]).set_consistency(consistency)
+    for lesson in workload.execute_statement(handle, lesson_request, "index_query", "Lessons"):
+        statements["Quizzes"].set_variable("$lessonId", lesson["id"])
+        quiz_request = QueryRequest().set_prepared_statement(statements["Quizzes"]).set_consistency(consistency)
+        workload.execute_statement(handle, quiz_request, "index_query", "Quizzes")
+    metrics.record_latency("load_course", "Courses", start_ns, time.perf_counter_ns())
+
+def lookup_user(handle, user_id, consistency, statements):
+    start_ns = time.perf_counter_ns()
+    get_request = GetRequest().set_table_name("Users").set_key({"id": user_id}).set_consistency(consistency)
+    rate_control.timed_call("get", "Users", handle.get, get_request)
+    statements["Enrollments"].set_variable("$userId", user_id)
+    enrollment_request = QueryRequest().set_prepared_statement(statements["Enrollments"]).set_consistency(consistency)
+    workload.execute_statement(handle, enrollment_request, "index_query", "Enrollments")
+    metrics.record_latency("load_user", "Users", start_ns, time.perf_counter_ns())
+
+def prepare_lookup_statements(handle):
+    statements = {}
+    lookups = [("Enrollments", "userId")]
+    if config.SCHEMA_MODE == "hierarchy":
+        statements["Courses"] = handle.prepare(PrepareRequest().set_statement(config.COURSE_TREE_STATEMENT)).get_prepared_statement()
+    else:
+        lookups += [("Lessons", "courseId"), ("Quizzes", "lessonId")]
+    for table, field in lookups:
+        statement = f'DECLARE ${field} STRING; SELECT * FROM {table} WHERE {field} = ${field}'
+        statements[table] = handle.prepare(PrepareRequest().set_statement(statement)).get_prepared_statement()
+    return statements
+
+def run_read_workload(handle, course_ids, user_ids, consistency):
+    statements = prepare_lookup_statements(handle)
+    for _ in range(config.READ_WORKLOAD_OPERATIONS):
+        if random.random() < 0.5:
+            lookup_course(handle, random.choice(course_ids), consistency, statements)
+        else:
+            lookup_user(handle, random.choice(user_ids), consistency, statements)
+    print(f"Read workload with {consistency} consistency completed successfully")
+
+def read_workload(handle):
+    copies = []
+    metrics.measure_time("Insert Index Sample (no indexes)", lambda: insert_index_sample(handle, "no indexes", copies))
+    delete_index_sample(handle, copies)
+    metrics.measure_time("Create Indexes", lambda: create_indexes(handle))
+    metrics.measure_time("Insert Index Sample (indexed)", lambda: insert_index_sample(handle, "indexed", copies))
+    delete_index_sample(handle, copies)
+
+    course_ids = [result["id"] for result in workload.query_rows(handle, 'SELECT id FROM Courses', "Courses")]
+    user_ids = [result["id"] for result in workload.query_rows(handle, 'SELECT id FROM Users', "Users")]
+    if not course_ids or not user_ids:
+        print("Read workload skipped, no courses or users found")
+        return
+    for consistency in config.READ_CONSISTENCIES:
+        metrics.measure_time(f"Point Reads ({consistency})", lambda: run_read_workload(handle, course_ids, user_ids, getattr(Consistency, consistency)))
+
+class CachedResult:
+    def __init__(self, results):
+        self.results = results
+
+    def get_results(self):
+        return self.results
+
+class CachedHandle:
+    # Read-through cache in front of a handle: get results are cached by table
+    # and key, prepared SELECT results (the child lookups) by statement and
+    # bound variables. Entries are evicted least recently used beyond
+    # max_entries and expire ttl seconds after they were loaded. Writes go to
+    # the handle and invalidate every entry they may have changed
+    def __init__(self, handle, max_entries, ttl):
+        self.handle = handle
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.get_keys = {}
+        self.query_keys = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def statement_tables(statement):
+        # Every capitalized, possibly dotted name; keywords are harmless since
+        # no table is named after them
+        return set(re.findall(r'\b[A-Z][A-Za-z]*(?:\.[A-Z][A-Za-z]*)*', statement))
+
+    def lookup(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                self.remove(key)
+                self.expirations += 1
+            self.misses += 1
+            return None
+
+    def store(self, key, value, index_keys):
+        with self.lock:
+            if key in self.entries:
+                self.remove(key)
+            self.entries[key] = (time.monotonic() + self.ttl, value, index_keys)
+            for index, index_key in index_keys:
+                index.setdefault(index_key, set()).add(key)
+            while len(self.entries) > self.max_entries:
+                self.remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    def remove(self, key):
+        _, _, index_keys = self.entries.pop(key)
+        for index, index_key in index_keys:
+            keys = index.get(index_key)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del index[index_key]
+
+    def invalidate(self, table, record=None):
+        # Drops the cached gets of the written row, or of the whole table when
+        # the row is not known, and every cached query reading the table
+        with self.lock:
+            keys = set(self.query_keys.get(table, ()))
+            if record is None:
+                for (get_table, _), get_keys in self.get_keys.items():
+                    if get_table == table:
+                        keys.update(get_keys)
+            else:
+                get_keys = self.get_keys.get((table, record.get("id")), ())
+                keys.update(key for key in get_keys if all(record.get(name) == value for name, value in key[2]))
+            for key in keys:
+                if key in self.entries:
+                    self.remove(key)
+                    self.invalidations += 1
+
+    def invalidate_all(self):
+        with self.lock:
+            self.invalidations += len(self.entries)
+            self.entries.clear()
+            self.get_keys.clear()
+            self.query_keys.clear()
+
+    def get(self, request):
+        table = request.get_table_name()
+        key_fields = request.get_key()
+        key = ("get", table, frozenset(key_fields.items()))
+        result = self.lookup(key)
+        if result is None:
+            result = self.handle.get(request)
+            self.store(key, result, [(self.get_keys, (table, key_fields.get("id")))])
+        return result
+
+    def query(self, request):
+        prepared_statement = request.get_prepared_statement()
+        if prepared_statement is None:
+            # Scans pass through, any other statement may change rows
+            if not request.get_statement().lstrip().upper().startswith("SELECT"):
+                self.invalidate_all()
+            return self.handle.query(request)
+        statement = prepared_statement.get_sql_text()
+        if not statement.split(";")[-1].lstrip().upper().startswith("SELECT"):
+            self.invalidate_all()
+            return self.handle.query(request)
+        key = ("query", statement, frozenset(prepared_statement.get_variables().items()))
+        results = self.lookup(key)
+        if results is None:
+            results = []
+            while True:
+                results.extend(self.handle.query(request).get_results())
+                if request.is_done():
+                    break
+            self.store(key, results, [(self.query_keys, table) for table in self.statement_tables(statement)])
+        else:
+            request.set_cont_key(None)
+        return CachedResult(results)
+
+    def put(self, request):
+        result = self.handle.put(request)
+        self.invalidate(request.get_table_name(), request.get_value())
+        return result
+
+    def delete(self, request):
+        result = self.handle.delete(request)
+        self.invalidate(request.get_table_name(), request.get_key())
+        return result
+
+    def write_multiple(self, request):
+        result = self.handle.write_multiple(request)
+        for operation in request.get_operations():
+            table_request = operation.get_request()
+            self.invalidate(table_request.get_table_name())
+        return result
+
+    def multi_delete(self, request):
+        result = self.handle.multi_delete(request)
+        self.invalidate(request.get_table_name())
+        return result
+
+    def prepare(self, request):
+        return self.handle.prepare(request)
+
+    def do_table_request(self, request, timeout_ms, poll_interval_ms):
+        self.invalidate_all()
+        return self.handle.do_table_request(request, timeout_ms, poll_interval_ms)
+
+    def close(self):
+        self.invalidate_all()
+
+def zipf_sequence(keys, size, exponent):
+    # Key popularity follows 1 / rank ** exponent over a shuffled ranking
+    ranked = list(keys)
+    random.shuffle(ranked)
+    cum_weights = list(accumulate(1 / rank ** exponent for rank in range(1, len(ranked) + 1)))
+    return random.choices(ranked, cum_weights=cum_weights, k=size)
+
+def rewrite_user(handle, source_handle, user_id):
+    # The row is read from the source handle past the cache, so both runs pay
+    # the same for it
+    get_request = GetRequest().set_table_name("Users").set_key({"id": user_id})
+    user = dict(source_handle.get(get_request).get_value())
+    user["name"] = user["name"] + "_rewritten"
+    rate_control.timed_call("put", "Users", handle.put, PutRequest().set_table_name("Users").set_value(user))
+
+def replay_lookups(handle, source_handle, operations):
+    statements = prepare_lookup_statements(handle)
+    for kind, key in operations:
+        if kind == "course":
+            lookup_course(handle, key, Consistency.EVENTUAL, statements)
+        elif kind == "user":
+            lookup_user(handle, key, Consistency.EVENTUAL, statements)
+        else:
+            rewrite_user(handle, source_handle, key)
+    print(f"{len(operations)} lookups replayed successfully")
+
+def cache_benchmark(handle):
+    if not config.RUN_READ_WORKLOAD:
+        create_indexes(handle)
+    course_ids = [result["id"] for result in workload.query_rows(handle, 'SELECT id FROM Courses', "Courses")]
+    user_ids = [result["id"] for result in workload.query_rows(handle, 'SELECT id FROM Users', "Users")]
+    if not course_ids or not user_ids:
+        print("Cache benchmark skipped, no courses or users found")
+        return
+    # Both runs replay the very same operations
+    courses = iter(zipf_sequence(course_ids, config.CACHE_READ_OPERATIONS, config.CACHE_ZIPF_EXPONENT))
+    users = iter(zipf_sequence(user_ids, config.CACHE_READ_OPERATIONS, config.CACHE_ZIPF_EXPONENT))
+    operations = []
+    for _ in range(config.CACHE_READ_OPERATIONS):
+        draw = random.random()
+        if draw < config.CACHE_WRITE_FRACTION:
+            operations.append(("write", next(users)))
+        elif draw < (1 + config.CACHE_WRITE_FRACTION) / 2:
+            operations.append(("course", next(courses)))
+        else:
+            operations.append(("user", next(users)))
+
+    metrics.measure_time("Cached Reads (cache off)", lambda: replay_lookups(handle, handle, operations))
+    metrics.cache_stats.append(("off", config.CACHE_MAX_ENTRIES, config.CACHE_TTL_SECONDS, metrics.timings[-1][1], len(operations) / metrics.timings[-1][1] if metrics.timings[-1][1] > 0 else 0.0, 0, 0, 0, 0, 0))
+    cached_handle = CachedHandle(handle, config.CACHE_MAX_ENTRIES, config.CACHE_TTL_SECONDS)
+    metrics.measure_time("Cached Reads (cache on)", lambda: replay_lookups(cached_handle, handle, operations))
+    duration = metrics.timings[-1][1]
+    metrics.cache_stats.append(("on", config.CACHE_MAX_ENTRIES, config.CACHE_TTL_SECONDS, duration, len(operations) / duration if duration > 0 else 0.0,
+                        cached_handle.hits, cached_handle.misses, cached_handle.evictions, cached_handle.expirations, cached_handle.invalidations))
+    lookups = cached_handle.hits + cached_handle.misses
+    hit_rate = cached_handle.hits / lookups * 100 if lookups else 0.0
+    print(f"Cache: {cached_handle.hits} hits, {cached_handle.misses} misses ({hit_rate:.1f}% hit rate), {cached_handle.evictions} evictions, {cached_handle.expirations} expirations, {cached_handle.invalidations} invalidations")
+    baseline = metrics.cache_stats[-2][3]
+    print(f"Cached reads took {duration:.2f} seconds ({baseline / duration if duration > 0 else 0.0:.2f}x without cache)")
+
+def read_course_tree_flat(handle, course_id):
+    # Follows the id arrays down the hierarchy with one get per row
+    start_ns = time.perf_counter_ns()
+    course_request = GetRequest().set_table_name("Courses").set_key({"id": course_id})
+    course = rate_control.timed_call("get", "Courses", handle.get, course_request).get_value()
+    rows = 1
+    for lesson_id in course["lessons"]:
+        lesson_request = GetRequest().set_table_name("Lessons").set_key(schema.get_primary_key("Lessons", {"id": lesson_id, "courseId": course_id}))
+        lesson = rate_control.timed_call("get", "Lessons", handle.get, lesson_request).get_value()
+        rows += 1
+        for quiz_id in schema.get_document("Lessons", lesson)["quizzes"]:
+            quiz_request = GetRequest().set_table_name("Quizzes").set_key(schema.get_primary_key("Quizzes", {"id": quiz_id, "lessonId": lesson_id}))
+            quiz = rate_control.timed_call("get", "Quizzes", handle.get, quiz_request).get_value()
+            rows += 1
+            for question_id in schema.get_document("Quizzes", quiz)["questions"]:
+                question_request = GetRequest().set_table_name("Questions").set_key(schema.get_primary_key("Questions", {"id": question_id, "quizId": quiz_id}))
+                rate_control.timed_call("get", "Questions", handle.get, question_request)
+                rows += 1
+    metrics.record_latency("load_course_tree", "Courses", start_ns, time.perf_counter_ns())
+    return rows
+
+def read_course_tree_nested(handle, statement, course_id):
+    start_ns = time.perf_counter_ns()
+    statement.set_variable("$id", course_id)
+    request = QueryRequest().set_prepared_statement(statement)
+    results = workload.execute_statement(handle, request, "nested_query", "Courses")
+    metrics.record_latency("load_course_tree", "Courses", start_ns, time.perf_counter_ns())
+    return len(results)
+
+def read_course_trees(handle, course_ids):
+    rows = 0
+    if config.SCHEMA_MODE == "hierarchy":
+        statement = handle.prepare(PrepareRequest().set_statement(config.COURSE_TREE_STATEMENT)).get_prepared_statement()
+        for course_id in course_ids:
+            rows += read_course_tree_nested(handle, statement, course_id)
+    else:
+        for course_id in course_ids:
+            rows += read_course_tree_flat(handle, course_id)
+    print(f"{len(course_ids)} course trees read successfully ({rows} rows)")
+    return rows
@@ -0,0 +1,84 @@
+from . import config, lazy, metrics
+
+# Plots and the Excel workbook of every result list.
+
+def show_or_save(fig, filename):
+    # Headless runs write the figure to a file instead of opening a window
+    if filename is None:
+        lazy.plt.show()
+        return
+    fig.savefig(filename)
+    lazy.plt.close(fig)
+    print(f"Plot saved to {filename} successfully")
+
+def plot_timings(filename=None):
+    with metrics.histograms_lock:
+        phase_histograms = {}
+        for (phase, operation, table), histogram in metrics.histograms.items():
+            phase_histograms.setdefault(phase, []).append((f"{operation} {table}", histogram))
+    if not phase_histograms:
+        return
+
+    # One latency CDF subplot per phase, one line per operation and table
+    fig, axes = lazy.plt.subplots(len(phase_histograms), 1, figsize=(12, 4 * len(phase_histograms)), squeeze=False)
+    for ax, (phase, entries) in zip(axes[:, 0], phase_histograms.items()):
+        for label, histogram in entries:
+            points = histogram.cdf()
+            ax.step([value / 1e6 for value, _ in points], [fraction * 100 for _, fraction in points], where='post', label=label)
+        ax.set_xscale('log')
+        ax.set_xlabel('Latency (ms)')
+        ax.set_ylabel('Percentile')
+        ax.set_title(f'{phase} latency CDF')
+        ax.grid(True)
+        ax.legend(fontsize='small')
+    fig.suptitle('Latency of OracleNoSQL Database Operations')
+    fig.tight_layout()
+    show_or_save(fig, filename)
+
+def plot_durations(filename=None):
+    if not metrics.timings:
+        return
+    fig = lazy.plt.figure(figsize=(12, 6))
+    lazy.plt.barh([operation for operation, _ in metrics.timings], [duration for _, duration in metrics.timings], color='skyblue')
+    lazy.plt.xlabel('Time (seconds)')
+    lazy.plt.title('Performance of Oracle NoSQL Database Operations')
+    lazy.plt.grid(axis='x')
+    fig.tight_layout()
+    show_or_save(fig, filename)
+
+def save_timings_to_excel(filename="timings_.xlsx"):
+    timings_df = lazy.pd.DataFrame(metrics.timings, columns=["Operation", "Duration (seconds)"])
+    throughputs_df = lazy.pd.DataFrame(metrics.throughputs, columns=["Operation", "Write Mode", "Table", "Rows", "Duration (seconds)", "Rows/sec"])
+    query_stats_df = lazy.pd.DataFrame(metrics.query_stats, columns=["Statement", "Rows", "Batches", "First Row (seconds)", "Duration (seconds)"])
+    generator_stats_df = lazy.pd.DataFrame(metrics.generator_stats, columns=["Generator", "Rows", "Duration (seconds)", "Rows/sec"])
+    index_stats_df = lazy.pd.DataFrame(metrics.index_stats, columns=["Name", "Measurement", "Users", "Courses", "Value"])
+    profile_stats_df = lazy.pd.DataFrame(metrics.profile_stats, columns=["Phase", "Wall (seconds)", "Process CPU (seconds)", "Request Wall (seconds)", "Request CPU (seconds)",
+                                                                         "Request Waiting (seconds)", "Peak Traced Memory (MB)", "Profile"])
+    mixed_stats_df = lazy.pd.DataFrame(metrics.mixed_stats, columns=["Window", "Key Distribution", "Arrival", "Target Ops/sec", "Requests", "Ops/sec", "p50 (ms)", "p99 (ms)", "p99.9 (ms)", "Max (ms)",
+                                                                     "Service p99 (ms)"])
+    cache_stats_df = lazy.pd.DataFrame(metrics.cache_stats, columns=["Cache", "Max Entries", "TTL (seconds)", "Duration (seconds)", "Ops/sec", "Hits", "Misses", "Evictions", "Expirations", "Invalidations"])
+    layout_stats_df = lazy.pd.DataFrame(metrics.layout_stats, columns=["Layout", "Write Mode", "Load (seconds)", "Load Rows/sec", "Trees Read", "Read (seconds)", "Trees/sec"])
+    retry_stats_df = lazy.pd.DataFrame(metrics.retry_stats, columns=["Table", "Requests", "Retries", "Throttles", "Failures", "Waited Requests", "Wait (seconds)",
+                                                                     "Rate (ops/sec)", "Min Rate (ops/sec)"])
+    max_throughput_stats_df = lazy.pd.DataFrame(metrics.max_throughput_stats, columns=["Window", "Offered Ops/sec", "Achieved Ops/sec", "Service p50 (ms)", "Service p99 (ms)",
+                                                                                       "p99 incl. Queueing (ms)", "Throttles", "Retries", "Sustained", "Knee"])
+    memory_stats_df = lazy.pd.DataFrame(metrics.memory_stats, columns=["Phase", "RSS at Start (MB)", "Peak RSS (MB)"])
+    async_stats_df = lazy.pd.DataFrame(metrics.async_stats, columns=["Depth", "Phase", "Operations", "Duration (seconds)", "Ops/sec", "p50 (ms)", "p99 (ms)"])
+    percentile_columns = [f"p{percentile:g} (ms)" for percentile in config.REPORT_PERCENTILES]
+    latencies_df = lazy.pd.DataFrame(metrics.latency_rows(), columns=["Phase", "Request", "Table", "Count", "Ops/sec"] + percentile_columns + ["Max (ms)", "Service p99 (ms)"])
+    with lazy.pd.ExcelWriter(filename) as writer:
+        timings_df.to_excel(writer, sheet_name="Timings", index=False)
+        latencies_df.to_excel(writer, sheet_name="Latency", index=False)
+        throughputs_df.to_excel(writer, sheet_name="Throughput", index=False)
+        query_stats_df.to_excel(writer, sheet_name="Queries", index=False)
+        generator_stats_df.to_excel(writer, sheet_name="Generators", index=False)
+        async_stats_df.to_excel(writer, sheet_name="Async", index=False)
+        index_stats_df.to_excel(writer, sheet_name="Indexes", index=False)
+        layout_stats_df.to_excel(writer, sheet_name="Layouts", index=False)
+        cache_stats_df.to_excel(writer, sheet_name="Cache", index=False)
+        mixed_stats_df.to_excel(writer, sheet_name="Mixed", index=False)
+        max_throughput_stats_df.to_excel(writer, sheet_name="Max Throughput", index=False)
+        retry_stats_df.to_excel(writer, sheet_name="Retries", index=False)
+        profile_stats_df.to_excel(writer, sheet_name="Profile", index=False)
+        memory_stats_df.to_excel(writer, sheet_name="Memory", index=False)
+    print(f"Timings saved to {filename} successfully")
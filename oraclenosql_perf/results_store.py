@@ -0,0 +1,112 @@
+import json
+import sqlite3
+import statistics
+from datetime import datetime, timezone
+
+# SQLite store of benchmark runs: one row per run with its metadata, the
+# duration of every phase and the latency summary of every (phase, operation,
+# table). Named baselines group runs that later runs are compared against.
+
+STATEMENTS = [
+    'CREATE TABLE IF NOT EXISTS runs (id INTEGER PRIMARY KEY AUTOINCREMENT, created TEXT NOT NULL, metadata TEXT NOT NULL)',
+    'CREATE TABLE IF NOT EXISTS phases (run_id INTEGER NOT NULL REFERENCES runs(id), phase TEXT NOT NULL, duration REAL NOT NULL)',
+    'CREATE TABLE IF NOT EXISTS latencies (run_id INTEGER NOT NULL REFERENCES runs(id), phase TEXT NOT NULL, operation TEXT NOT NULL, '
+    'table_name TEXT NOT NULL, count INTEGER NOT NULL, ops_per_sec REAL NOT NULL, percentiles TEXT NOT NULL, max_ms REAL NOT NULL)',
+    'CREATE TABLE IF NOT EXISTS baselines (name TEXT NOT NULL, run_id INTEGER NOT NULL REFERENCES runs(id), PRIMARY KEY(name, run_id))'
+]
+
+# Metadata that has to match for two runs to be comparable
+COMPARABLE_METADATA = ["scale", "strategy", "backend"]
+
+def connect(path):
+    connection = sqlite3.connect(path)
+    for statement in STATEMENTS:
+        connection.execute(statement)
+    return connection
+
+def save_run(path, metadata, phases, latencies):
+    # latencies are (phase, operation, table, count, ops/sec, {percentile: ms}, max ms)
+    with connect(path) as connection:
+        cursor = connection.execute('INSERT INTO runs (created, metadata) VALUES (?, ?)',
+                                    (datetime.now(timezone.utc).isoformat(timespec='seconds'), json.dumps(metadata, sort_keys=True, default=str)))
+        run_id = cursor.lastrowid
+        connection.executemany('INSERT INTO phases VALUES (?, ?, ?)', [(run_id, phase, duration) for phase, duration in phases])
+        connection.executemany('INSERT INTO latencies VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                               [(run_id, phase, operation, table or "", count, ops_per_sec, json.dumps(percentiles), max_ms)
+                                for phase, operation, table, count, ops_per_sec, percentiles, max_ms in latencies])
+    connection.close()
+    return run_id
+
+def add_to_baseline(path, name, run_id):
+    with connect(path) as connection:
+        if connection.execute('SELECT 1 FROM runs WHERE id = ?', (run_id,)).fetchone() is None:
+            raise ValueError(f"Run {run_id} does not exist in {path}")
+        connection.execute('INSERT OR IGNORE INTO baselines VALUES (?, ?)', (name, run_id))
+    connection.close()
+
+def load_metadata(connection, run_id):
+    row = connection.execute('SELECT metadata FROM runs WHERE id = ?', (run_id,)).fetchone()
+    if row is None:
+        raise ValueError(f"Run {run_id} does not exist")
+    return json.loads(row[0])
+
+def load_latencies(connection, run_id):
+    latencies = {}
+    for phase, operation, table, count, ops_per_sec, percentiles, max_ms in connection.execute(
+            'SELECT phase, operation, table_name, count, ops_per_sec, percentiles, max_ms FROM latencies WHERE run_id = ?', (run_id,)):
+        latencies[(phase, operation, table)] = (count, ops_per_sec, json.loads(percentiles).get("99", max_ms))
+    return latencies
+
+def is_regression(current, values, threshold, sigmas, higher_is_better):
+    # The allowed change is the larger of the relative threshold and the
+    # spread of the baseline runs, so noisy measurements need a larger change
+    mean = statistics.mean(values)
+    spread = statistics.stdev(values) if len(values) > 1 else 0.0
+    tolerance = max(threshold * mean, sigmas * spread)
+    if higher_is_better:
+        return current < mean - tolerance, mean
+    return current > mean + tolerance, mean
+
+def compare_run(path, run_id, baseline, threshold, sigmas, min_count):
+    # Returns the regressions of the run against the named baseline as
+    # (phase, operation, table, metric, baseline mean, current value)
+    connection = connect(path)
+    try:
+        named_runs = [row[0] for row in connection.execute('SELECT run_id FROM baselines WHERE name = ? AND run_id != ?', (baseline, run_id))]
+        if not named_runs:
+            raise ValueError(f"Baseline {baseline} has no runs in {path}")
+        # Only baseline runs of the same scale, strategy and backend count, so
+        # one baseline can hold every point of a scaling sweep
+        metadata = load_metadata(connection, run_id)
+        baseline_runs = []
+        for baseline_run in named_runs:
+            baseline_metadata = load_metadata(connection, baseline_run)
+            if all(baseline_metadata.get(name) == metadata.get(name) for name in COMPARABLE_METADATA):
+                baseline_runs.append(baseline_run)
+        if not baseline_runs:
+            raise ValueError(f"Baseline {baseline} has no run with the scale, strategy and backend of run {run_id}")
+        current = load_latencies(connection, run_id)
+        baseline_latencies = [load_latencies(connection, baseline_run) for baseline_run in baseline_runs]
+    finally:
+        connection.close()
+
+    regressions = []
+    print(f"Run {run_id} against baseline {baseline} ({len(baseline_runs)} run(s)):")
+    print(f"  {'phase':<40} {'operation':<15} {'table':<12} {'ops/sec':>10} {'baseline':>10} {'p99 ms':>9} {'baseline':>9}")
+    for key, (count, ops_per_sec, p99) in current.items():
+        samples = [latencies[key] for latencies in baseline_latencies if key in latencies]
+        if not samples or count < min_count or statistics.mean(sample[0] for sample in samples) < min_count:
+            continue
+        throughput_regression, baseline_ops = is_regression(ops_per_sec, [sample[1] for sample in samples], threshold, sigmas, True)
+        latency_regression, baseline_p99 = is_regression(p99, [sample[2] for sample in samples], threshold, sigmas, False)
+        marks = []
+        if throughput_regression:
+            regressions.append(key + ("ops/sec", baseline_ops, ops_per_sec))
+            marks.append("throughput")
+        if latency_regression:
+            regressions.append(key + ("p99 ms", baseline_p99, p99))
+            marks.append("p99")
+        flag = f"  REGRESSION ({', '.join(marks)})" if marks else ""
+        phase, operation, table = key
+        print(f"  {phase:<40} {operation:<15} {table or '-':<12} {ops_per_sec:>10.1f} {baseline_ops:>10.1f} {p99:>9.3f} {baseline_p99:>9.3f}{flag}")
+    return regressions
@@ -0,0 +1,85 @@
+import os
+
+# Plots of a headless run go to files, so matplotlib must not look for a
+# display when a report needs it
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+from . import config, metrics, phases, reports, workload
+from .cli import run_metadata
+import argparse
+import json
+import sys
+import time
+
+# Headless runner: runs the named phases without prompting and writes the
+# reports to files. matplotlib and pandas are only imported for --plot and
+# --excel, Faker and numpy only when a phase generates data.
+
+def write_json_report(path, names, multiplication):
+    report = {
+        "metadata": run_metadata(multiplication, {}),
+        "phases": names,
+        "timings": [{"phase": phase, "duration": duration} for phase, duration in metrics.timings],
+        "latencies": [dict(zip(["phase", "operation", "table", "count", "ops_per_sec"] + [f"p{percentile:g}_ms" for percentile in config.REPORT_PERCENTILES] + ["max_ms", "service_p99_ms"], row))
+                      for row in metrics.latency_rows()],
+        "memory": [{"phase": phase, "start_rss_mb": start_rss, "peak_rss_mb": peak_rss} for phase, start_rss, peak_rss in metrics.memory_stats],
+        "retries": [dict(zip(["table", "requests", "retries", "throttles", "failures", "waited_requests", "wait_seconds", "rate", "min_rate"], row)) for row in metrics.retry_stats]
+    }
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+    print(f"Report saved to {path} successfully")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run Oracle NoSQL Database benchmark phases without prompting")
+    parser.add_argument("phases", nargs="*", default=["benchmark"], help="phases to run in order, see --list (default: benchmark)")
+    parser.add_argument("--list", action="store_true", help="list the phases and exit")
+    parser.add_argument("--multiplication", type=int, default=1, help="multiply the amount of data by this factor")
+    parser.add_argument("--scale-children", action="store_true",
+                        help="also multiply the lessons per course, quizzes per lesson and questions per quiz")
+    parser.add_argument("--dataset", action=argparse.BooleanOptionalAction, default=config.USE_DATASET,
+                        help="replay the pre-generated dataset instead of streaming freshly generated rows, loaded before the first phase that inserts it")
+    parser.add_argument("--output-dir", default="reports", help="directory the reports are written to")
+    parser.add_argument("--excel", action="store_true", help="also write the Excel workbook of every result sheet")
+    parser.add_argument("--plot", action="store_true", help="also write the latency CDF and phase duration plots")
+    parser.add_argument("--rate-control", action="store_true", help="pace throttled tables with AIMD rate control instead of the driver's retry handler")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    if args.list:
+        for name, phase in phases.PHASES.items():
+            print(f"{name:<35} {phase.title or '(reports its own phases)'}")
+        return 0
+    unknown = [name for name in args.phases if name not in phases.PHASES]
+    if unknown:
+        print(f"Unknown phase(s) {', '.join(unknown)}, see --list")
+        return 2
+
+    config.RATE_CONTROL = config.RATE_CONTROL or args.rate_control
+    start_time = time.perf_counter()
+    config.edit_number_of_operations(args.multiplication, args.scale_children)
+    handle = None
+    try:
+        handle = workload.get_handle()
+        phases.run_phases(phases.RunContext(handle, load_dataset=args.dataset), args.phases)
+    except Exception as e:
+        print(e)
+        return 1
+    finally:
+        workload.close_write_executor()
+        if handle is not None:
+            handle.close()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    name = f"OracleNoSQL_{args.multiplication}"
+    write_json_report(os.path.join(args.output_dir, f"report_{name}.json"), args.phases, args.multiplication)
+    if args.excel:
+        reports.save_timings_to_excel(os.path.join(args.output_dir, f"timings_{name}.xlsx"))
+    if args.plot:
+        reports.plot_timings(os.path.join(args.output_dir, f"latency_{name}.png"))
+        reports.plot_durations(os.path.join(args.output_dir, f"durations_{name}.png"))
+    print(f"Phases completed in {time.perf_counter() - start_time:.2f} seconds")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
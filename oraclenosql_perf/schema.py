@@ -0,0 +1,103 @@
+from . import config
+
+# How the rows of the flat data model map onto the tables of each schema
+# mode: table names, keys, shard keys and document columns.
+
+def get_shard_key(table):
+    return config.SHARD_KEYS[config.SCHEMA_MODE].get(table)
+
+def get_table_name(table):
+    if config.SCHEMA_MODE == "hierarchy":
+        return config.CHILD_TABLES.get(table, table)
+    return table
+
+def get_key_fields(table):
+    key_fields = config.PRIMARY_KEYS.get(config.SCHEMA_MODE, {}).get(table)
+    if key_fields is not None:
+        return key_fields
+    shard_key = get_shard_key(table)
+    return [shard_key, "id"] if shard_key is not None else ["id"]
+
+def get_primary_key(table, record):
+    return {name: record[name] for name in get_key_fields(table)}
+
+def get_batch_group(table):
+    # All tables of the course hierarchy share the course id as shard key, so
+    # a course and its descendants can be written in one batch
+    if config.SCHEMA_MODE == "hierarchy" and (table == "Courses" or table in config.CHILD_TABLES):
+        return "Courses"
+    return table
+
+def course_tree_rows(course, descendants):
+    # Converts a course and its flat descendants to hierarchy rows, parents
+    # first, replacing the id arrays by the inherited parent keys
+    course_id = course["id"]
+    quiz_lessons = {}
+    lessons = []
+    quizzes = []
+    questions = []
+    for table, row in descendants:
+        if table == "Lessons":
+            lessons.append({"id": course_id, "lessonId": row["id"], "title": row["title"], "content": row["content"]})
+        elif table == "Quizzes":
+            quiz_lessons[row["id"]] = row["lessonId"]
+            quizzes.append({"id": course_id, "lessonId": row["lessonId"], "quizId": row["id"], "title": row["title"]})
+        else:
+            questions.append(row)
+    yield "Courses", {"id": course_id, "title": course["title"], "description": course["description"], "instructor": course["instructor"], "enrollments": course["enrollments"]}
+    for lesson in lessons:
+        yield "Lessons", lesson
+    for quiz in quizzes:
+        yield "Quizzes", quiz
+    for question in questions:
+        yield "Questions", {"id": course_id, "lessonId": quiz_lessons[question["quizId"]], "quizId": question["quizId"], "questionId": question["id"], "text": question["text"], "options": question["options"], "correctAnswer": question["correctAnswer"]}
+
+def hierarchy_rows(rows):
+    # The generators yield a course after all of its descendants, so they are
+    # held back until the course arrives and its subtree can be converted
+    descendants = []
+    for table, row in rows:
+        if table in config.CHILD_TABLES:
+            descendants.append((table, row))
+        elif table == "Courses":
+            yield from course_tree_rows(row, descendants)
+            descendants = []
+        else:
+            yield table, row
+
+def document_rows(rows):
+    for table, row in rows:
+        fields = config.DOCUMENT_FIELDS.get(table)
+        if fields is not None:
+            document = {name: row[name] for name in fields}
+            row = {name: value for name, value in row.items() if name not in fields}
+            row["doc"] = document
+        yield table, row
+
+def schema_rows(rows):
+    # Generated rows are flat, the hierarchy and json schemas store them
+    # differently
+    if config.SCHEMA_MODE == "hierarchy":
+        return hierarchy_rows(rows)
+    if config.SCHEMA_MODE == "json":
+        return document_rows(rows)
+    return rows
+
+def get_document(table, row):
+    # The fields of a row that the json schema keeps in the doc column
+    return row["doc"] if config.SCHEMA_MODE == "json" and table in config.DOCUMENT_FIELDS else row
+
+def get_update_field(table):
+    if config.SCHEMA_MODE == "json" and table in config.DOCUMENT_FIELDS:
+        return "doc." + config.UPDATE_FIELDS[table]
+    return config.UPDATE_FIELDS[table]
+
+def mark_updated(table, record):
+    # Appends "_updated" to the update field of a copy of the record
+    record = dict(record)
+    if config.SCHEMA_MODE == "json" and table in config.DOCUMENT_FIELDS:
+        record["doc"] = dict(record["doc"])
+    document = get_document(table, record)
+    field = config.UPDATE_FIELDS[table]
+    document[field] = document[field] + "_updated"
+    return record
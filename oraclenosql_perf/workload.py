@@ -0,0 +1,504 @@
+from borneo import (
+    DeleteRequest, MultiDeleteRequest, NoSQLException, NoSQLHandle,
+    NoSQLHandleConfig, PrepareRequest, PutRequest, QueryRequest,
+    TableLimits, TableRequest, WriteMultipleRequest)
+from borneo.kv import StoreAccessTokenProvider
+from . import config, generation, metrics, rate_control, schema
+from .mock_handle import MockNoSQLHandle
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import multiprocessing
+import queue
+import re
+import threading
+import time
+
+# The store side of the benchmark: handles, writers, table DDL, queries and
+# the insert, retrieve, update and delete phases, in one process or split
+# across worker processes.
+
+write_stats = {}
+write_stats_lock = threading.Lock()
+write_seconds = 0.0
+rewritten_tables = ()
+
+worker_state = threading.local()
+worker_handles = []
+worker_handles_lock = threading.Lock()
+write_executor = None
+
+def reset_results():
+    # Clears everything collected by the phases, sweep results excepted
+    for results in [metrics.timings, metrics.throughputs, metrics.query_stats, metrics.generator_stats, metrics.async_stats, metrics.index_stats, metrics.layout_stats, metrics.cache_stats, metrics.mixed_stats, metrics.retry_stats, metrics.max_throughput_stats, metrics.profile_stats, metrics.memory_stats, metrics.payload_stats]:
+        results.clear()
+    rate_control.rate_controller.reset()
+    with metrics.histograms_lock:
+        metrics.histograms.clear()
+        metrics.service_histograms.clear()
+    with metrics.request_times_lock:
+        metrics.request_times.clear()
+
+def get_handle():
+    if config.BACKEND == "mock":
+        print(f'Using in-process mock backend ({config.MOCK_LATENCY_MS} ms latency, {config.MOCK_JITTER_MS} ms jitter, {config.MOCK_THROTTLE_RATE} throttle rate)')
+        return MockNoSQLHandle(config.MOCK_LATENCY_MS, config.MOCK_JITTER_MS, config.MOCK_THROTTLE_RATE)
+    print('Using on-premise endpoint ' + config.kvstore_endpoint)
+    endpoint = config.kvstore_endpoint
+    provider = StoreAccessTokenProvider()
+    handle_config = NoSQLHandleConfig(endpoint, provider)
+    if config.RATE_CONTROL:
+        handle_config.configure_default_retry_handler(0, 0)
+    return NoSQLHandle(handle_config)
+
+def init_worker_handle():
+    handle = get_handle()
+    worker_state.handle = handle
+    with worker_handles_lock:
+        worker_handles.append(handle)
+
+def get_write_executor():
+    global write_executor
+    if write_executor is None:
+        write_executor = ThreadPoolExecutor(max_workers=config.NUM_WORKERS, initializer=init_worker_handle)
+    return write_executor
+
+def close_write_executor():
+    global write_executor
+    if write_executor is not None:
+        write_executor.shutdown(wait=True)
+        write_executor = None
+    with worker_handles_lock:
+        for handle in worker_handles:
+            handle.close()
+        worker_handles.clear()
+
+def record_write(table, rows=1):
+    # Rows of the tables put_rows was told are rewritten replace rows an
+    # earlier step inserted and are reported apart from the inserts
+    name = f"{table} (rewrites)" if table in rewritten_tables else table
+    with write_stats_lock:
+        stats = write_stats.setdefault(name, {"rows": 0, "seconds": 0.0, "open": False})
+        stats["rows"] += rows
+        stats["open"] = True
+
+def close_write_window(seconds):
+    # Every put_rows call is one write window, the tables written in it are
+    # credited with its duration
+    global write_seconds
+    with write_stats_lock:
+        for stats in write_stats.values():
+            if stats["open"]:
+                stats["seconds"] += seconds
+                stats["open"] = False
+        write_seconds += seconds
+
+def reset_write_stats():
+    global write_seconds
+    with write_stats_lock:
+        write_stats.clear()
+        write_seconds = 0.0
+
+def report_write_throughput(operation_name):
+    # The tables of one window are written interleaved, so each one's rate is
+    # its rows over the windows it was written in rather than the span from
+    # its first to its last write, which overlaps the other tables' windows
+    with write_stats_lock:
+        stats = dict(write_stats)
+        duration = write_seconds
+    if not stats:
+        return
+    print(f"{operation_name} throughput ({config.WRITE_MODE}, {config.NUM_WORKERS if config.WRITE_MODE == 'concurrent' else 1} worker(s)):")
+    for table, table_stats in stats.items():
+        rows_per_sec = table_stats["rows"] / table_stats["seconds"] if table_stats["seconds"] > 0 else 0.0
+        metrics.throughputs.append((operation_name, config.WRITE_MODE, table, table_stats["rows"], table_stats["seconds"], rows_per_sec))
+        print(f"  {table}: {table_stats['rows']} rows in {table_stats['seconds']:.2f} seconds ({rows_per_sec:.1f} rows/sec)")
+    total_rows = sum(table_stats["rows"] for table_stats in stats.values())
+    rows_per_sec = total_rows / duration if duration > 0 else 0.0
+    metrics.throughputs.append((operation_name, config.WRITE_MODE, "All Tables", total_rows, duration, rows_per_sec))
+    print(f"  All tables: {total_rows} rows in {duration:.2f} seconds ({rows_per_sec:.1f} rows/sec)")
+
+def put_row(handle, table, row):
+    request = PutRequest().set_table_name(schema.get_table_name(table)).set_value(row)
+    rate_control.timed_call("put", table, handle.put, request)
+    record_write(table)
+
+def worker_put_row(table, row):
+    put_row(worker_state.handle, table, row)
+
+def put_rows_concurrently(rows):
+    executor = get_write_executor()
+    max_pending = config.NUM_WORKERS * config.MAX_PENDING_PER_WORKER
+    pending = set()
+    for table, row in rows:
+        if len(pending) >= max_pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                future.result()
+        pending.add(executor.submit(worker_put_row, table, row))
+    done, _ = wait(pending)
+    for future in done:
+        future.result()
+
+def put_batch(handle, group, rows):
+    if len(rows) == 1:
+        put_row(handle, *rows[0])
+        return
+    request = WriteMultipleRequest()
+    for table, row in rows:
+        request.add(PutRequest().set_table_name(schema.get_table_name(table)).set_value(row), True)
+    result = rate_control.timed_call("write_multiple", group, handle.write_multiple, request)
+    if not result.get_success():
+        raise NoSQLException(f"Batch write to {group} failed at operation {result.get_failed_operation_index()}")
+    table_rows = {}
+    for table, _ in rows:
+        table_rows[table] = table_rows.get(table, 0) + 1
+    for table, count in table_rows.items():
+        record_write(table, count)
+
+def put_rows_batched(handle, rows):
+    # The generators yield siblings one after another, so a group's open batch
+    # is flushed as soon as a row with a different shard key value arrives. In
+    # the hierarchy schema a course subtree that fits into BATCH_SIZE rows is
+    # therefore written atomically in one request
+    batches = {}
+    for table, row in rows:
+        shard_key = schema.get_shard_key(table)
+        if shard_key is None:
+            put_row(handle, table, row)
+            continue
+        group = schema.get_batch_group(table)
+        batch = batches.get(group)
+        if batch is not None and (batch[0] != row[shard_key] or len(batch[1]) >= config.BATCH_SIZE):
+            put_batch(handle, group, batch[1])
+            batch = None
+        if batch is None:
+            batch = batches[group] = (row[shard_key], [])
+        batch[1].append((table, row))
+    for group, batch in batches.items():
+        put_batch(handle, group, batch[1])
+
+def put_rows(handle, rows, rewrites=()):
+    # Rows are (table, row) pairs and must not be modified once yielded, since
+    # in concurrent mode a worker may still be serializing them. The rows of
+    # the tables in rewrites replace rows that were inserted before
+    global rewritten_tables
+    rows = schema.schema_rows(rows)
+    rewritten_tables = rewrites
+    start_time = time.perf_counter()
+    try:
+        if config.WRITE_MODE == "concurrent":
+            put_rows_concurrently(rows)
+        elif config.WRITE_MODE == "batched":
+            put_rows_batched(handle, rows)
+        else:
+            for table, row in rows:
+                put_row(handle, table, row)
+    finally:
+        close_write_window(time.perf_counter() - start_time)
+        rewritten_tables = ()
+
+def put_dataset(handle, dataset):
+    # The sections are separate write windows, and the enrollments section
+    # rewrites the students with their courses
+    put_rows(handle, dataset.rows("users"))
+    put_rows(handle, dataset.rows("courses"))
+    put_rows(handle, dataset.rows("enrollments"), rewrites=("Users",))
+
+def query_rows(handle, statement, table=None):
+    # Follows the continuation until the query is done and yields the rows of
+    # every batch as they arrive, so callers never hold the whole result
+    request = QueryRequest().set_statement(statement)
+    if config.QUERY_LIMIT:
+        request.set_limit(config.QUERY_LIMIT)
+    if config.QUERY_MAX_READ_KB:
+        request.set_max_read_kb(config.QUERY_MAX_READ_KB)
+    rows = 0
+    batches = 0
+    first_row_time = None
+    start_time = time.perf_counter()
+    try:
+        while True:
+            query_result = rate_control.timed_call("query", table, handle.query, request)
+            batches += 1
+            for result in query_result.get_results():
+                if first_row_time is None:
+                    first_row_time = time.perf_counter() - start_time
+                rows += 1
+                yield result
+            if request.is_done():
+                break
+    finally:
+        duration = time.perf_counter() - start_time
+        metrics.query_stats.append((statement, rows, batches, first_row_time, duration))
+        first_row = f"{first_row_time * 1000:.1f} ms" if first_row_time is not None else "n/a"
+        print(f"{statement}: {rows} rows in {batches} batches, first row after {first_row}, {duration:.2f} seconds total")
+
+def scan_table(handle, table):
+    return query_rows(handle, f'SELECT * FROM {schema.get_table_name(table)}', table)
+
+def do_table_request(handle, request):
+    # DDL and table limit changes are throttled too, they count as table None
+    return rate_control.call_with_retry(None, lambda table_request: handle.do_table_request(table_request, 40000, 3000), request)
+
+def create_tables(handle):
+    statements = config.TABLE_STATEMENTS[config.SCHEMA_MODE]
+
+    for statement in statements:
+        request = TableRequest().set_statement(statement)
+        do_table_request(handle, request)
+    print("Tables created successfully")
+    if config.TABLE_LIMITS is not None:
+        set_table_limits(handle, *config.TABLE_LIMITS)
+
+def set_table_limits(handle, read_units, write_units, storage_gb):
+    # Child tables share the limits of their top-level table
+    for statement in config.TABLE_STATEMENTS[config.SCHEMA_MODE]:
+        table = re.search(r'CREATE TABLE (?:IF NOT EXISTS )?([\w.]+)', statement, re.IGNORECASE).group(1)
+        if "." in table:
+            continue
+        request = TableRequest().set_table_name(table).set_table_limits(TableLimits(read_units, write_units, storage_gb))
+        do_table_request(handle, request)
+    print(f"Table limits set to {read_units} read units, {write_units} write units, {storage_gb} GB")
+
+def drop_tables(handle):
+    # Child tables have to be dropped before their parents, whatever schema
+    # mode created them
+    tables = [config.CHILD_TABLES[table] for table in reversed(list(config.CHILD_TABLES))] + config.TABLES
+    for table in tables:
+        drop_statement = f'DROP TABLE IF EXISTS {table}'
+        drop_request = TableRequest().set_statement(drop_statement)
+        do_table_request(handle, drop_request)
+    print("Tables dropped successfully")
+
+def insert_users(handle, dataset=None):
+    # Returns the instructor ids the courses are assigned to and the students
+    # the enrollments are generated for
+    instructors = generation.IdIndex()
+    students = generation.StudentIndex()
+    rows = dataset.rows("users") if dataset is not None else generation.get_generators()[0]()
+    put_rows(handle, generation.index_users(rows, instructors, students))
+    print("Users inserted successfully")
+    return instructors, students
+
+def retrieve_users(handle):
+    # Streams the stored users, so they are never all held at once
+    for result in scan_table(handle, "Users"):
+        yield dict(result)
+
+def insert_courses(handle, instructors, dataset=None):
+    # Every row of the hierarchy already carries its final ids, so in
+    # concurrent mode each one is an independent job. Returns the course ids
+    course_ids = generation.IdIndex()
+    rows = dataset.rows("courses") if dataset is not None else generation.get_generators()[1](instructors)
+    put_rows(handle, generation.index_courses(rows, course_ids))
+    print(f"{len(course_ids)} courses, their lessons, quizzes, and questions inserted successfully")
+    return course_ids
+
+def insert_enrollments(handle, students, course_ids, dataset=None):
+    # The students are rewritten with the courses they are enrolled in
+    rows = dataset.rows("enrollments") if dataset is not None else generation.get_generators()[2](students, course_ids)
+    put_rows(handle, rows, rewrites=("Users",))
+    print("Enrollments inserted successfully")
+
+def retrieve_enrollments(handle):
+    enrollments = []
+    for result in scan_table(handle, "Enrollments"):
+        enrollments.append(dict(result))
+    print(f"{len(enrollments)} enrollments retrieved successfully")
+    return enrollments
+
+def insert_all_data(handle, dataset=None):
+    # Rows stream from the generators straight to the writer, only the
+    # instructor and course ids and the students are kept for the following
+    # steps
+    reset_write_stats()
+    start_time = time.perf_counter()
+    instructors, students = insert_users(handle, dataset)
+    course_ids = insert_courses(handle, instructors, dataset)
+    insert_enrollments(handle, students, course_ids, dataset)
+    duration = time.perf_counter() - start_time
+    print(f"Inserting all data took {duration:.2f} seconds")
+    report_write_throughput("Insert All Data")
+
+def retrieve_all_data(handle):
+    query_tables = ["Users", "Courses", "Lessons", "Quizzes", "Questions", "Enrollments"]
+    rows = 0
+    for table in query_tables:
+        for _ in scan_table(handle, table):
+            rows += 1
+    print(f"All data retrieved successfully ({rows} rows)")
+
+def update_all_data(handle):
+    query_tables = ["Users", "Courses", "Lessons", "Quizzes", "Questions", "Enrollments"]
+    for table in query_tables:
+        for result in scan_table(handle, table):
+            record = schema.mark_updated(table, result)
+            put_request = PutRequest().set_table_name(schema.get_table_name(table)).set_value(record)
+            rate_control.timed_call("put", table, handle.put, put_request)
+    print("All data updated successfully")
+
+def rename_users(handle):
+    # Gives every user a new generated name, one read-modify-write per user
+    for result in scan_table(handle, "Users"):
+        record = dict(result)
+        record["name"] = generation.fake.name()
+        rate_control.timed_call("put", "Users", handle.put, PutRequest().set_table_name("Users").set_value(record))
+    print("Users renamed successfully")
+
+def delete_all_data(handle):
+    tables = ["Users", "Courses", "Lessons", "Quizzes", "Questions", "Enrollments"]
+    for table in tables:
+        for result in scan_table(handle, table):
+            record = dict(result)
+            delete_request = DeleteRequest().set_table_name(schema.get_table_name(table)).set_key(schema.get_primary_key(table, record))
+            rate_control.timed_call("delete", table, handle.delete, delete_request)
+    print("All data deleted successfully")
+
+def execute_statement(handle, request, operation, table):
+    # Runs a DML statement until it is done and returns all of its result rows
+    results = []
+    while True:
+        query_result = rate_control.timed_call(operation, table, handle.query, request)
+        results.extend(query_result.get_results())
+        if request.is_done():
+            return results
+
+def update_all_data_statement(handle):
+    for table in config.TABLES:
+        field = schema.get_update_field(table)
+        key_fields = schema.get_key_fields(table)
+        declarations = ", ".join(f"${name} STRING" for name in key_fields)
+        conditions = " AND ".join(f"t.{name} = ${name}" for name in key_fields)
+        statement = f"DECLARE {declarations}; UPDATE {schema.get_table_name(table)} t SET t.{field} = t.{field} || '_updated' WHERE {conditions}"
+        prepared_statement = handle.prepare(PrepareRequest().set_statement(statement)).get_prepared_statement()
+        # Only the primary key columns travel to the client
+        for key in query_rows(handle, f"SELECT {', '.join(key_fields)} FROM {schema.get_table_name(table)}", table):
+            for name in key_fields:
+                prepared_statement.set_variable(f"${name}", key[name])
+            request = QueryRequest().set_prepared_statement(prepared_statement)
+            execute_statement(handle, request, "update_statement", table)
+    print("All data updated successfully")
+
+def delete_all_data_statement(handle):
+    deleted = 0
+    for table in config.TABLES:
+        request = QueryRequest().set_statement(f"DELETE FROM {schema.get_table_name(table)}")
+        for result in execute_statement(handle, request, "delete_statement", table):
+            deleted += result.get("numRowsDeleted", 0)
+    print(f"All data deleted successfully ({deleted} rows)")
+
+def delete_all_data_multi(handle):
+    deleted = 0
+    for table in config.TABLES:
+        shard_key = schema.get_shard_key(table) or "id"
+        shard_values = set()
+        for result in query_rows(handle, f"SELECT {shard_key} FROM {schema.get_table_name(table)}", table):
+            shard_values.add(result[shard_key])
+        for value in shard_values:
+            request = MultiDeleteRequest().set_table_name(schema.get_table_name(table)).set_key({shard_key: value})
+            while True:
+                result = rate_control.timed_call("multi_delete", table, handle.multi_delete, request)
+                deleted += result.get_num_deletions()
+                continuation_key = result.get_continuation_key()
+                if continuation_key is None:
+                    break
+                request.set_continuation_key(continuation_key)
+    print(f"All data deleted successfully ({deleted} rows)")
+
+UPDATE_FUNCTIONS = {"read_modify_write": update_all_data, "statement": update_all_data_statement}
+DELETE_FUNCTIONS = {"read_delete": delete_all_data, "statement": delete_all_data_statement, "multi_delete": delete_all_data_multi}
+
+def insert_partition(handle, dataset):
+    reset_write_stats()
+    put_dataset(handle, dataset)
+    report_write_throughput("Insert All Data")
+
+def update_partition(handle, dataset):
+    for table, row in schema.schema_rows(generation.latest_rows(dataset)):
+        record = schema.mark_updated(table, row)
+        put_request = PutRequest().set_table_name(schema.get_table_name(table)).set_value(record)
+        rate_control.timed_call("put", table, handle.put, put_request)
+
+def delete_partition(handle, dataset):
+    for table, row in schema.schema_rows(generation.latest_rows(dataset)):
+        delete_request = DeleteRequest().set_table_name(schema.get_table_name(table)).set_key(schema.get_primary_key(table, row))
+        rate_control.timed_call("delete", table, handle.delete, delete_request)
+
+def run_worker_process(worker_index, settings, dataset, barrier, results):
+    # Settings are passed explicitly since a spawned process starts from the
+    # module defaults
+    vars(config).update(settings)
+    # A forked process starts with the results the parent collected so far
+    reset_results()
+    handle = None
+    try:
+        handle = get_handle()
+        phases = [
+            ("Insert All Data", lambda: insert_partition(handle, dataset)),
+            ("Update All Data", lambda: update_partition(handle, dataset)),
+            ("Delete All Data", lambda: delete_partition(handle, dataset))
+        ]
+        for phase, func in phases:
+            # Every phase starts in all processes at the same time
+            barrier.wait()
+            metrics.measure_time(phase, func)
+        results.put((worker_index, None, metrics.timings, metrics.histograms, metrics.service_histograms, metrics.throughputs, rate_control.rate_controller.snapshot()))
+    except Exception as e:
+        barrier.abort()
+        results.put((worker_index, repr(e), metrics.timings, metrics.histograms, metrics.service_histograms, metrics.throughputs, rate_control.rate_controller.snapshot()))
+    finally:
+        close_write_executor()
+        if handle is not None:
+            handle.close()
+
+def run_worker_processes(dataset):
+    partitions = generation.partition_dataset(dataset, config.NUM_PROCESSES)
+    settings = config.worker_settings()
+    context = multiprocessing.get_context()
+    barrier = context.Barrier(config.NUM_PROCESSES)
+    results = context.Queue()
+    processes = [context.Process(target=run_worker_process, args=(i, settings, partitions[i], barrier, results)) for i in range(config.NUM_PROCESSES)]
+    for process in processes:
+        process.start()
+    # Drain the queue before joining, a process does not exit until its result
+    # has been consumed
+    worker_results = []
+    while len(worker_results) < len(processes):
+        try:
+            worker_results.append(results.get(timeout=1))
+        except queue.Empty:
+            if not any(process.is_alive() for process in processes):
+                raise RuntimeError(f"{len(processes) - len(worker_results)} worker process(es) exited without a result")
+    worker_results.sort(key=lambda worker_result: worker_result[0])
+    for process in processes:
+        process.join()
+    errors = [f"worker {worker_index}: {error}" for worker_index, error, _, _, _, _, _ in worker_results if error is not None]
+    if errors:
+        raise RuntimeError("Worker processes failed: " + "; ".join(errors))
+
+    # A phase lasts until its slowest process is done
+    phase_durations = {}
+    for worker_index, _, worker_timings, worker_histograms, worker_service_histograms, _, worker_retries in worker_results:
+        rate_control.rate_controller.merge(worker_retries)
+        for phase, duration in worker_timings:
+            phase_durations[phase] = max(phase_durations.get(phase, 0.0), duration)
+            print(f"{phase} took {duration:.2f} seconds in worker {worker_index}")
+        with metrics.histograms_lock:
+            for target, source in [(metrics.histograms, worker_histograms), (metrics.service_histograms, worker_service_histograms)]:
+                for key, histogram in source.items():
+                    if key in target:
+                        target[key].merge(histogram)
+                    else:
+                        target[key] = histogram
+    write_mode = f"{config.WRITE_MODE} x{config.NUM_PROCESSES} processes"
+    merged_throughputs = {}
+    for _, _, _, _, _, worker_throughputs, _ in worker_results:
+        for phase, _, table, rows, duration, _ in worker_throughputs:
+            merged = merged_throughputs.setdefault((phase, table), [0, 0.0])
+            merged[0] += rows
+            merged[1] = max(merged[1], duration)
+    for (phase, table), (rows, duration) in merged_throughputs.items():
+        metrics.throughputs.append((phase, write_mode, table, rows, duration, rows / duration if duration > 0 else 0.0))
+    for phase, duration in phase_durations.items():
+        metrics.timings.append((phase, duration))
+        print(f"{phase} took {duration:.2f} seconds across {config.NUM_PROCESSES} processes")
+        metrics.report_latencies(phase)
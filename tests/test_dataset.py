@@ -0,0 +1,60 @@
+from oraclenosql_perf import config, generation
+import pytest
+
+def user(number, role):
+    return {"id": f"user-{number}", "name": f"name {number}", "email": f"{number}@example.com", "role": role, "enrolledCourses": []}
+
+def course_tree(number):
+    yield "Lessons", {"id": f"lesson-{number}", "courseId": f"course-{number}", "title": "lesson", "content": "text", "quizzes": []}
+    yield "Courses", {"id": f"course-{number}", "title": "course", "description": "text", "instructor": "user-0", "lessons": [f"lesson-{number}"], "enrollments": []}
+
+def enrollments(users):
+    for row in users:
+        if row["role"] == "student":
+            yield "Users", dict(row, enrolledCourses=["course-0"])
+            yield "Enrollments", {"id": f"enrollment-{row['id']}", "userId": row["id"], "courseId": "course-0", "enrollmentDate": None, "progress": "completed"}
+
+@pytest.fixture
+def dataset(tmp_path, monkeypatch):
+    # Small chunks, so that every section spans several of them
+    monkeypatch.setattr(config, "DATASET_CHUNK_ROWS", 3)
+    users = [user(number, "instructor" if number % 3 == 0 else "student") for number in range(10)]
+    path = tmp_path / "dataset.chunks"
+    generation.write_dataset(str(path), [("Users", row) for row in users],
+                             (row for number in range(4) for row in course_tree(number)), enrollments(users))
+    return generation.Dataset(str(path))
+
+def test_rows_round_trip(dataset):
+    users = list(dataset.rows("users"))
+    assert [row["id"] for _, row in users] == [f"user-{number}" for number in range(10)]
+    assert users[1] == ("Users", user(1, "student"))
+    assert [table for table, _ in dataset.rows("courses")] == ["Lessons", "Courses"] * 4
+    assert len(dataset) == 10 + 8 + 12
+    assert len(dataset.chunks["users"]) == 4
+
+def test_partitions_keep_trees_and_students_together(dataset):
+    partitions = generation.partition_dataset(dataset, 3)
+    for section in ["users", "courses", "enrollments"]:
+        rows = sorted((table, row["id"]) for partition in partitions for table, row in partition.rows(section))
+        assert rows == sorted((table, row["id"]) for table, row in dataset.rows(section))
+    for partition in partitions:
+        user_ids = {row["id"] for _, row in partition.rows("users")}
+        for table, row in partition.rows("enrollments"):
+            assert (row["id"] if table == "Users" else row["userId"]) in user_ids
+        courses = list(partition.rows("courses"))
+        for (lesson_table, lesson), (course_table, course) in zip(courses[::2], courses[1::2]):
+            assert (lesson_table, course_table, lesson["courseId"]) == ("Lessons", "Courses", course["id"])
+
+def test_latest_rows(dataset):
+    latest = {(table, row["id"]): row for table, row in generation.latest_rows(dataset)}
+    assert len(latest) == 10 + 8 + 6
+    assert latest[("Users", "user-1")]["enrolledCourses"] == ["course-0"]
+    assert latest[("Users", "user-0")]["enrolledCourses"] == []
+
+def test_temporary_dataset_is_removed(dataset, tmp_path):
+    path = tmp_path / "temporary.chunks"
+    generation.write_dataset(str(path), [], [], [])
+    temporary = generation.Dataset(str(path), temporary=True)
+    assert len(temporary) == 0
+    del temporary
+    assert not path.exists()
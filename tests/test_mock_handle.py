@@ -0,0 +1,66 @@
+from borneo import GetRequest, PutRequest, QueryRequest, TableRequest, ThrottlingException
+from oraclenosql_perf import mock_handle
+from oraclenosql_perf.mock_handle import MockNoSQLHandle
+import pytest
+
+@pytest.fixture
+def handle():
+    mock_handle.reset()
+    handle = MockNoSQLHandle()
+    handle.do_table_request(TableRequest().set_statement(
+        'CREATE TABLE IF NOT EXISTS Lessons (id STRING, courseId STRING, title STRING, PRIMARY KEY(id))'))
+    yield handle
+    handle.close()
+    mock_handle.reset()
+
+def put_lessons(handle, count, course_id="c1"):
+    for index in range(count):
+        handle.put(PutRequest().set_table_name("Lessons").set_value({"id": f"l{index}", "courseId": course_id, "title": f"Lesson {index}"}))
+
+def query_all(handles, statement, limit=0):
+    # Sends every page to the next handle in turn, like the worker handles of
+    # the concurrent and async runners
+    request = QueryRequest().set_statement(statement)
+    if limit:
+        request.set_limit(limit)
+    rows = []
+    pages = 0
+    while True:
+        rows.extend(handles[pages % len(handles)].query(request).get_results())
+        pages += 1
+        if request.is_done():
+            return rows, pages
+
+def test_put_get(handle):
+    put_lessons(handle, 1)
+    result = handle.get(GetRequest().set_table_name("Lessons").set_key({"id": "l0"}))
+    assert result.get_value() == {"id": "l0", "courseId": "c1", "title": "Lesson 0"}
+    assert handle.get(GetRequest().set_table_name("Lessons").set_key({"id": "missing"})).get_value() is None
+
+def test_query_where(handle):
+    put_lessons(handle, 3, "c1")
+    handle.put(PutRequest().set_table_name("Lessons").set_value({"id": "other", "courseId": "c2", "title": "Other"}))
+    rows, _ = query_all([handle], "SELECT id FROM Lessons WHERE courseId = 'c2'")
+    assert rows == [{"id": "other"}]
+
+def test_paged_query(handle):
+    put_lessons(handle, 10)
+    rows, pages = query_all([handle], "SELECT * FROM Lessons", limit=3)
+    assert pages == 4
+    assert sorted(row["id"] for row in rows) == sorted(f"l{index}" for index in range(10))
+
+def test_paged_query_across_handles(handle):
+    put_lessons(handle, 10)
+    other = MockNoSQLHandle()
+    rows, pages = query_all([handle, other], "SELECT * FROM Lessons", limit=3)
+    assert pages == 4
+    assert sorted(row["id"] for row in rows) == sorted(f"l{index}" for index in range(10))
+
+def test_throttle_injection(handle):
+    throttled = MockNoSQLHandle(throttle_rate=1.0)
+    with pytest.raises(ThrottlingException):
+        throttled.put(PutRequest().set_table_name("Lessons").set_value({"id": "l0", "courseId": "c1", "title": "Lesson 0"}))
+    with pytest.raises(ThrottlingException):
+        throttled.get(GetRequest().set_table_name("Lessons").set_key({"id": "l0"}))
+    # Throttled requests are refused before they are applied
+    assert handle.get(GetRequest().set_table_name("Lessons").set_key({"id": "l0"})).get_value() is None
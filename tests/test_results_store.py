@@ -0,0 +1,40 @@
+from oraclenosql_perf import results_store
+import pytest
+
+METADATA = {"scale": {"multiplication": 1}, "strategy": {"write_mode": "single"}, "backend": {"backend": "mock"}}
+
+def save(path, ops_per_sec, p99, metadata=METADATA):
+    latencies = [("Insert All Data", "put", "Users", 1000, ops_per_sec, {"50": p99 / 2, "99": p99}, p99 * 2)]
+    return results_store.save_run(str(path), metadata, [("Insert All Data", 1.0)], latencies)
+
+@pytest.fixture
+def baseline(tmp_path):
+    path = tmp_path / "results.sqlite"
+    for ops_per_sec, p99 in [(1000, 5.0), (1010, 5.1), (990, 4.9)]:
+        results_store.add_to_baseline(str(path), "main", save(path, ops_per_sec, p99))
+    return path
+
+def compare(path, run_id, baseline_name="main"):
+    return results_store.compare_run(str(path), run_id, baseline_name, 0.10, 3.0, 100)
+
+def test_is_regression():
+    assert results_store.is_regression(800, [1000, 1000], 0.10, 3.0, True) == (True, 1000)
+    assert results_store.is_regression(950, [1000, 1000], 0.10, 3.0, True) == (False, 1000)
+    assert results_store.is_regression(12.0, [10.0, 10.0], 0.10, 3.0, False) == (True, 10.0)
+
+def test_compare_run_passes(baseline):
+    assert compare(baseline, save(baseline, 1005, 5.05)) == []
+
+def test_compare_run_flags_regressions(baseline):
+    regressions = compare(baseline, save(baseline, 700, 9.0))
+    assert [regression[3] for regression in regressions] == ["ops/sec", "p99 ms"]
+    assert regressions[0][:3] == ("Insert All Data", "put", "Users")
+
+def test_compare_run_without_baseline(baseline):
+    with pytest.raises(ValueError):
+        compare(baseline, save(baseline, 1000, 5.0), "missing")
+
+def test_compare_run_ignores_other_scales(baseline):
+    run_id = save(baseline, 100, 50.0, dict(METADATA, scale={"multiplication": 8}))
+    with pytest.raises(ValueError):
+        compare(baseline, run_id)